@@ -2,349 +2,147 @@ import streamlit as st
 import random
 import base64
 import os
+import io
+import hashlib
+import tempfile
+import threading
+import atexit
+import weakref
+import logging
 import re
 import unicodedata
 import difflib
-from tempfile import NamedTemporaryFile
 from gtts import gTTS
 import speech_recognition as sr
 from audio_recorder_streamlit import audio_recorder
 import pandas as pd
+import numpy as np
 import json
-from datetime import datetime, timedelta
+import wave
+import heapq
+import bisect
+import queue
+import sqlite3
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 import time
 
+try:
+    import Levenshtein
+except ImportError:  # pure-Python fallback below
+    Levenshtein = None
+
+try:
+    from rapidfuzz import process as rf_process
+    from rapidfuzz.distance import Indel
+except ImportError:
+    rf_process = Indel = None
+
+try:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from scipy import sparse
+    import sklearn
+except ImportError:  # semantic scoring mode unavailable
+    TfidfVectorizer = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
 # ============================================
 # PREMIUM DESIGN SYSTEM - CSS INJECTION
 # ============================================
 
-def inject_custom_css():
-    """Inject premium CSS styling into Streamlit"""
-    css = """
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&family=JetBrains+Mono:wght@400;500&display=swap');
+THEME_FILE = "premium_theme.css"
+# "inline" (minified <style>, default) or "link" (stylesheet via static serving)
+THEME_MODE = os.environ.get("THEME_MODE", "inline")
+STATIC_THEME_DIR = "static"
+# Self-hosted fonts, Latin subsets: (family, weight range, file in static/fonts)
+WEBFONTS = (
+    ("Inter", "400 800", "Inter-Variable.woff2"),
+    ("JetBrains Mono", "400 700", "JetBrainsMono-Variable.woff2"),
+)
 
-    .stApp {
-        background: linear-gradient(135deg, #0f172a 0%, #1e1b4b 50%, #0f172a 100%);
-        font-family: 'Inter', sans-serif;
-    }
 
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    header {visibility: hidden;}
-
-    ::-webkit-scrollbar { width: 8px; }
-    ::-webkit-scrollbar-track { background: #0f172a; }
-    ::-webkit-scrollbar-thumb { background: #334155; border-radius: 4px; }
-    ::-webkit-scrollbar-thumb:hover { background: #6366f1; }
-
-    /* Premium Cards */
-    .premium-card {
-        background: rgba(30, 41, 59, 0.7);
-        backdrop-filter: blur(20px);
-        -webkit-backdrop-filter: blur(20px);
-        border: 1px solid rgba(99, 102, 241, 0.2);
-        border-radius: 16px;
-        padding: 24px;
-        margin-bottom: 16px;
-        transition: all 0.3s ease;
-        box-shadow: 0 4px 24px rgba(0, 0, 0, 0.3);
-    }
-    .premium-card:hover {
-        border-color: rgba(99, 102, 241, 0.4);
-        box-shadow: 0 8px 32px rgba(99, 102, 241, 0.15);
-        transform: translateY(-2px);
-    }
+def minificar_css(css):
+    """Drop comments and redundant whitespace (enough for our hand-written theme)"""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r"([{;])\s*([-a-z]+)\s*:\s*", r"\1\2:", css)
+    return css.replace(";}", "}").strip()
 
-    /* Typography */
-    .premium-title {
-        font-family: 'Inter', sans-serif;
-        font-weight: 800;
-        font-size: 2.5rem;
-        background: linear-gradient(135deg, #fff 0%, #818cf8 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        background-clip: text;
-        margin-bottom: 8px;
-        letter-spacing: -0.02em;
-    }
-    .premium-subtitle {
-        font-family: 'Inter', sans-serif;
-        font-weight: 400;
-        font-size: 1.1rem;
-        color: #94a3b8;
-        margin-bottom: 32px;
-    }
-    .premium-heading {
-        font-family: 'Inter', sans-serif;
-        font-weight: 700;
-        font-size: 1.5rem;
-        color: #f8fafc;
-        margin-bottom: 16px;
-        display: flex;
-        align-items: center;
-        gap: 12px;
-    }
 
-    /* Badges */
-    .badge {
-        display: inline-flex;
-        align-items: center;
-        gap: 6px;
-        padding: 6px 14px;
-        border-radius: 9999px;
-        font-size: 0.875rem;
-        font-weight: 600;
-    }
-    .badge-primary {
-        background: rgba(99, 102, 241, 0.2);
-        color: #818cf8;
-        border: 1px solid rgba(99, 102, 241, 0.3);
-    }
-    .badge-success {
-        background: rgba(16, 185, 129, 0.2);
-        color: #34d399;
-        border: 1px solid rgba(16, 185, 129, 0.3);
-    }
-    .badge-warning {
-        background: rgba(245, 158, 11, 0.2);
-        color: #fbbf24;
-        border: 1px solid rgba(245, 158, 11, 0.3);
-    }
-    .badge-danger {
-        background: rgba(239, 68, 68, 0.2);
-        color: #f87171;
-        border: 1px solid rgba(239, 68, 68, 0.3);
-    }
+def _fontes_locais(base_url):
+    """@font-face rules for the webfonts present in static/fonts, if any"""
+    regras = []
+    for familia, pesos, arquivo in WEBFONTS:
+        if os.path.exists(os.path.join(STATIC_THEME_DIR, "fonts", arquivo)):
+            regras.append(f"@font-face {{ font-family: '{familia}'; font-weight: {pesos}; font-display: swap; "
+                          f"src: url('{base_url}fonts/{arquivo}') format('woff2'); }}")
+    return "\n".join(regras)
 
-    /* Buttons */
-    .premium-btn {
-        display: inline-flex;
-        align-items: center;
-        justify-content: center;
-        gap: 8px;
-        padding: 12px 24px;
-        border-radius: 12px;
-        font-family: 'Inter', sans-serif;
-        font-weight: 600;
-        font-size: 0.95rem;
-        border: none;
-        cursor: pointer;
-        transition: all 0.3s ease;
-        text-decoration: none;
-    }
-    .premium-btn-primary {
-        background: linear-gradient(135deg, #6366f1 0%, #8b5cf6 100%);
-        color: white;
-        box-shadow: 0 4px 16px rgba(99, 102, 241, 0.4);
-    }
-    .premium-btn-primary:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 8px 24px rgba(99, 102, 241, 0.6);
-    }
-    .premium-btn-secondary {
-        background: rgba(255, 255, 255, 0.1);
-        color: #f8fafc;
-        border: 1px solid rgba(255, 255, 255, 0.2);
-    }
-    .premium-btn-success {
-        background: linear-gradient(135deg, #10b981 0%, #059669 100%);
-        color: white;
-        box-shadow: 0 4px 16px rgba(16, 185, 129, 0.4);
-    }
 
-    /* Stats */
-    .stat-card {
-        background: rgba(30, 41, 59, 0.5);
-        border: 1px solid rgba(99, 102, 241, 0.2);
-        border-radius: 12px;
-        padding: 20px;
-        text-align: center;
-        transition: all 0.3s ease;
-    }
-    .stat-card:hover {
-        border-color: rgba(99, 102, 241, 0.4);
-        background: rgba(30, 41, 59, 0.7);
-    }
-    .stat-value {
-        font-family: 'JetBrains Mono', monospace;
-        font-size: 2rem;
-        font-weight: 700;
-        color: #818cf8;
-        line-height: 1;
-    }
-    .stat-label {
-        font-size: 0.875rem;
-        color: #64748b;
-        margin-top: 8px;
-        text-transform: uppercase;
-        letter-spacing: 0.05em;
-    }
+@st.cache_resource(max_entries=4)
+def _compilar_tema(path, assinatura, base_url):
+    with open(path, "r", encoding="utf-8") as f:
+        return minificar_css(_fontes_locais(base_url) + "\n" + f.read())
 
-    /* Progress */
-    .progress-container {
-        background: rgba(255, 255, 255, 0.1);
-        border-radius: 9999px;
-        height: 8px;
-        overflow: hidden;
-        margin: 12px 0;
-    }
-    .progress-fill {
-        height: 100%;
-        border-radius: 9999px;
-        background: linear-gradient(90deg, #6366f1, #8b5cf6);
-        transition: width 0.6s ease;
-    }
 
-    /* XP Bar */
-    .xp-container {
-        background: rgba(30, 41, 59, 0.8);
-        border: 1px solid rgba(99, 102, 241, 0.3);
-        border-radius: 16px;
-        padding: 16px 20px;
-        display: flex;
-        align-items: center;
-        gap: 16px;
-    }
-    .level-badge {
-        width: 48px;
-        height: 48px;
-        border-radius: 12px;
-        background: linear-gradient(135deg, #6366f1, #8b5cf6);
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        font-family: 'JetBrains Mono', monospace;
-        font-weight: 700;
-        font-size: 1.25rem;
-        color: white;
-        box-shadow: 0 4px 12px rgba(99, 102, 241, 0.4);
-        flex-shrink: 0;
-    }
+def compilar_tema(path=THEME_FILE, base_url="app/static/"):
+    """Minified theme, built once per process and again only if the file changes.
 
-    /* Feedback */
-    .feedback-success {
-        background: linear-gradient(135deg, rgba(16, 185, 129, 0.15) 0%, rgba(5, 150, 105, 0.15) 100%);
-        border: 1px solid rgba(16, 185, 129, 0.4);
-        border-radius: 12px;
-        padding: 16px;
-        color: #34d399;
-    }
-    .feedback-error {
-        background: linear-gradient(135deg, rgba(239, 68, 68, 0.15) 0%, rgba(220, 38, 38, 0.15) 100%);
-        border: 1px solid rgba(239, 68, 68, 0.4);
-        border-radius: 12px;
-        padding: 16px;
-        color: #f87171;
-    }
-    .feedback-info {
-        background: linear-gradient(135deg, rgba(59, 130, 246, 0.15) 0%, rgba(37, 99, 235, 0.15) 100%);
-        border: 1px solid rgba(59, 130, 246, 0.4);
-        border-radius: 12px;
-        padding: 16px;
-        color: #60a5fa;
-    }
+    base_url is where static/ is served from, as seen by the stylesheet.
+    """
+    return _compilar_tema(path, _assinatura_arquivo(path), base_url)
 
-    /* Vocab Card */
-    .vocab-card {
-        background: linear-gradient(135deg, rgba(30, 41, 59, 0.9) 0%, rgba(51, 65, 85, 0.9) 100%);
-        border: 1px solid rgba(99, 102, 241, 0.3);
-        border-radius: 16px;
-        padding: 32px;
-        text-align: center;
-        position: relative;
-        overflow: hidden;
-    }
-    .vocab-word {
-        font-size: 2rem;
-        font-weight: 700;
-        color: #f8fafc;
-        margin-bottom: 8px;
-    }
-    .vocab-translation {
-        font-size: 1.25rem;
-        color: #94a3b8;
-    }
 
-    /* Animations */
-    @keyframes fadeInUp {
-        from { opacity: 0; transform: translateY(20px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
-    @keyframes pulse {
-        0%, 100% { opacity: 1; }
-        50% { opacity: 0.5; }
-    }
-    @keyframes shimmer {
-        0% { transform: translateX(-100%); }
-        100% { transform: translateX(100%); }
-    }
-    .animate-fade-in {
-        animation: fadeInUp 0.6s ease forwards;
-    }
+def _publicar_tema():
+    """Write the theme under static/ (content-addressed) and return its URL"""
+    css = compilar_tema(base_url="")  # fonts/ resolves next to the stylesheet
+    nome = f"theme-{hashlib.sha1(css.encode('utf-8')).hexdigest()[:12]}.min.css"
+    path = os.path.join(STATIC_THEME_DIR, nome)
+    if not os.path.exists(path):
+        _gravar_arquivo_atomico(path, css.encode("utf-8"))
+    return f"app/static/{nome}"
 
-    /* Streak */
-    .streak-flame {
-        font-size: 2rem;
-        animation: flicker 1s ease-in-out infinite alternate;
-    }
-    @keyframes flicker {
-        0% { transform: scale(1) rotate(-2deg); }
-        100% { transform: scale(1.1) rotate(2deg); }
-    }
-
-    /* Divider */
-    .premium-divider {
-        height: 1px;
-        background: linear-gradient(90deg, transparent, rgba(99, 102, 241, 0.3), transparent);
-        margin: 24px 0;
-        border: none;
-    }
 
-    /* Streamlit overrides */
-    .stTextInput > div > div > input {
-        background: rgba(30, 41, 59, 0.8) !important;
-        border: 1px solid rgba(99, 102, 241, 0.3) !important;
-        border-radius: 12px !important;
-        color: #f8fafc !important;
-        padding: 14px 18px !important;
-        font-family: 'Inter', sans-serif !important;
-    }
-    .stTextInput > div > div > input:focus {
-        border-color: #818cf8 !important;
-        box-shadow: 0 0 0 3px rgba(99, 102, 241, 0.2) !important;
-    }
-    .stSelectbox > div > div > div {
-        background: rgba(30, 41, 59, 0.8) !important;
-        border: 1px solid rgba(99, 102, 241, 0.3) !important;
-        border-radius: 12px !important;
-        color: #f8fafc !important;
-    }
-    .stCheckbox > label {
-        color: #94a3b8 !important;
-    }
-    .stRadio > div {
-        background: transparent !important;
-    }
-    .stRadio > div > label {
-        color: #f8fafc !important;
-    }
-    .stDataFrame {
-        background: rgba(30, 41, 59, 0.5) !important;
-        border-radius: 12px !important;
-        border: 1px solid rgba(99, 102, 241, 0.2) !important;
-    }
-    </style>
-    """
-    st.markdown(css, unsafe_allow_html=True)
+def inject_custom_css():
+    """Inject premium CSS styling into Streamlit"""
+    if THEME_MODE == "link":
+        try:
+            st.markdown(f'<link rel="stylesheet" href="{_publicar_tema()}">', unsafe_allow_html=True)
+            return
+        except OSError as e:
+            logging.warning("could not publish theme, inlining it: %s", e)
+    try:
+        st.markdown(f"<style>{compilar_tema()}</style>", unsafe_allow_html=True)
+    except OSError as e:
+        logging.warning("theme not loaded: %s", e)
 
 # ============================================
 # DATA & STATE MANAGEMENT
 # ============================================
 
 USER_DATA_FILE = "user_progress.json"
-
-# Premium level system
+# "sqlite" (multi-user, default) or "jsonl" (file per user)
+PROGRESS_BACKEND = os.environ.get("PROGRESS_BACKEND", "sqlite")
+PROGRESS_DB = os.environ.get("PROGRESS_DB", "user_progress.db")
+DEFAULT_USER = "default"
+HISTORY_LOAD_LIMIT = 50
+# Rows kept in the session; the full log stays in the progress store
+HISTORY_SESSION_LIMIT = 200
+HISTORY_PAGE_SIZE = 20
+
+# Premium level system (default; LEVELS_FILE overrides it, see carregar_niveis)
+LEVELS_FILE = os.environ.get("LEVELS_FILE", "levels.json")
 LEVELS = {
     1: {"name": "Novice", "icon": "🌱", "xp_needed": 0},
     2: {"name": "Clerk", "icon": "📋", "xp_needed": 100},
@@ -365,86 +163,858 @@ ACHIEVEMENTS = {
 }
 
 
-def load_user_progress():
-    if os.path.exists(USER_DATA_FILE):
-        try:
-            with open(USER_DATA_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except (json.JSONDecodeError, IOError):
-            data = {}
-        
-        # Ensure all premium fields exist with proper types
-        data.setdefault("acertos", {})
-        data.setdefault("erros", {})
-        data.setdefault("xp", 0)
-        data.setdefault("level", 1)
-        data.setdefault("achievements", [])
-        data.setdefault("streak", 0)
-        data.setdefault("last_active", datetime.now().isoformat())
-        data.setdefault("total_exercises", 0)
-        data.setdefault("audio_used", 0)
-        # BUG FIX: store vocab_seen as list (JSON-compatible) instead of set
-        if "vocab_seen" not in data:
-            data["vocab_seen"] = []
-        elif isinstance(data["vocab_seen"], set):
-            data["vocab_seen"] = list(data["vocab_seen"])
-        return data
-    
+@dataclass(frozen=True)
+class RegraConquista:
+    """Unlock achievement `id` when `contador` reaches `meta` after `evento`"""
+    id: str
+    evento: str    # answer_correct | audio_used | vocab_seen | day_active
+    contador: str  # key of CONTADORES
+    meta: int
+
+
+# Counters the rules compare against; each one is O(1) to read
+CONTADORES = {
+    # Typed and spoken correct answers are stored apart; both count here
+    "corretas": lambda progress, sessao: progress["total_exercises"] + progress.get("audio_used", 0),
+    "sequencia": lambda progress, sessao: sessao.get("streak", 0),
+    "vocabulario": lambda progress, sessao: len(progress["vocab_seen"]),
+    "audio": lambda progress, sessao: progress.get("audio_used", 0),
+    "dias_seguidos": lambda progress, sessao: progress.get("dias_seguidos", 0),
+}
+
+# Declare new achievements here (plus their entry in ACHIEVEMENTS)
+ACHIEVEMENT_RULES = (
+    RegraConquista("first_blood", "answer_correct", "corretas", 1),
+    RegraConquista("perfect_streak_5", "answer_correct", "sequencia", 5),
+    RegraConquista("perfect_streak_10", "answer_correct", "sequencia", 10),
+    RegraConquista("vocab_50", "vocab_seen", "vocabulario", 50),
+    RegraConquista("vocab_100", "vocab_seen", "vocabulario", 100),
+    RegraConquista("audio_master", "audio_used", "audio", 10),
+    RegraConquista("week_warrior", "day_active", "dias_seguidos", 7),
+)
+
+REGRAS_POR_EVENTO = {}
+for _regra in ACHIEVEMENT_RULES:
+    REGRAS_POR_EVENTO.setdefault(_regra.evento, []).append(_regra)
+
+
+# Fold the event log into the snapshot once it grows past this size
+PROGRESS_COMPACT_BYTES = 64 * 1024
+
+
+def progresso_padrao():
     return {
         "acertos": {}, "erros": {},
         "xp": 0, "level": 1, "achievements": [],
         "streak": 0, "last_active": datetime.now().isoformat(),
-        "total_exercises": 0, "audio_used": 0, "vocab_seen": []
+        "total_exercises": 0, "audio_used": 0, "vocab_seen": set(),
+        "dias_seguidos": 0, "ultimo_dia": None
     }
 
 
-def save_user_progress(data):
-    data["last_active"] = datetime.now().isoformat()
-    # Ensure vocab_seen is always a list before saving
-    if isinstance(data.get("vocab_seen"), set):
-        data["vocab_seen"] = list(data["vocab_seen"])
-    try:
-        with open(USER_DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-    except IOError as e:
-        st.error(f"Erro ao salvar progresso: {e}")
+class RegistroVocab:
+    """Append-only table giving each normalized vocabulary word a position.
+
+    Positions are handed out once and never move, so the vocab_seen bitmaps
+    stay valid when vocabulary files are edited or reordered; a new word
+    simply takes the next free bit. The table lives in the progress store
+    itself (see palavras_vocab / adicionar_vocab), next to the bitmaps it
+    gives meaning to.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.palavras = []
+        self.posicoes = {}
+        self._lock = threading.Lock()
+        self._recarregar()
+
+    def _recarregar(self):
+        for palavra in self.store.palavras_vocab(len(self.palavras)):
+            self.posicoes.setdefault(palavra, len(self.palavras))
+            self.palavras.append(palavra)
+
+    def registrar(self, palavras):
+        """Positions of already normalized words, appending the unknown ones"""
+        palavras = list(palavras)
+        novas = [p for p in dict.fromkeys(palavras) if p not in self.posicoes]
+        if novas:
+            with self._lock:
+                # Idempotent in the store; other processes may be appending too
+                self.store.adicionar_vocab(novas)
+                self._recarregar()
+        return [self.posicoes[p] for p in palavras]
+
+
+@st.cache_resource
+def get_registro_vocab():
+    registro = RegistroVocab(get_progress_store())
+    # Bundled words first, so the common bitmaps stay short and dense
+    fontes = [SAMPLE_VOCAB, _ler_json(VOCAB_FILE)]
+    registro.registrar(normalizar(p["en"]) for fonte in fontes
+                       for palavras in fonte.values() for p in palavras)
+    return registro
+
+
+def vocab_id(palavra):
+    """Bit position of a vocabulary word in vocab_seen, independent of file order"""
+    return get_registro_vocab().registrar([normalizar(palavra)])[0]
+
+
+def codificar_vocab(posicoes):
+    """Seen words as "bm:" + base64 of a little-endian bitmap (1 bit per known word)"""
+    bits = np.zeros(max(posicoes, default=-1) + 1, dtype=bool)
+    bits[list(posicoes)] = True
+    return "bm:" + base64.b64encode(np.packbits(bits, bitorder="little")).decode("ascii")
+
+
+def decodificar_vocab(valor):
+    """Set of positions from the bitmap, or from a legacy list of words"""
+    if isinstance(valor, str) and valor.startswith("bm:"):
+        bits = np.unpackbits(np.frombuffer(base64.b64decode(valor[3:]), dtype=np.uint8), bitorder="little")
+        return set(np.flatnonzero(bits).tolist())
+    return set(get_registro_vocab().registrar([normalizar(p) for p in valor if isinstance(p, str)]))
+
+
+def _completar_progresso(data):
+    """Ensure all premium fields exist with proper types"""
+    for campo, valor in progresso_padrao().items():
+        data.setdefault(campo, valor)
+    if not isinstance(data["vocab_seen"], set):
+        data["vocab_seen"] = decodificar_vocab(data["vocab_seen"])
+    return data
+
+
+def progresso_json(data, **kwargs):
+    """Serialize progress; vocab_seen is a set in memory and packed on disk"""
+    return json.dumps({**data, "vocab_seen": codificar_vocab(data.get("vocab_seen", ()))},
+                      ensure_ascii=False, **kwargs)
+
+
+def aplicar_evento(data, evento):
+    """Apply one logged event to a progress dict in place"""
+    tipo = evento["tipo"]
+    if tipo == "resposta":
+        data["xp"] += evento.get("xp", 0)
+        contagem = data["acertos"] if evento["correta"] else data["erros"]
+        contagem[evento["resposta_en"]] = contagem.get(evento["resposta_en"], 0) + 1
+        if evento["correta"]:
+            # Typed and spoken answers are counted apart, as before the event log
+            if evento.get("audio"):
+                data["audio_used"] = data.get("audio_used", 0) + 1
+            else:
+                data["total_exercises"] += 1
+    elif tipo == "conquista":
+        if evento["id"] not in data["achievements"]:
+            data["achievements"].append(evento["id"])
+    elif tipo == "vocab":
+        # The position is logged with the word: replaying never touches the registry
+        data["vocab_seen"].add(evento["posicao"])
+    elif tipo == "revisao":
+        data.setdefault("srs", {})[evento["item"]] = evento["estado"]
+    elif tipo == "dificil":
+        palavras = data.setdefault("difficult_words", {})
+        palavras[evento["palavra"]] = palavras.get(evento["palavra"], 0) + 1
+    elif tipo == "dia":
+        ontem = (date.fromisoformat(evento["data"]) - timedelta(days=1)).isoformat()
+        if data.get("ultimo_dia") != evento["data"]:
+            data["dias_seguidos"] = data.get("dias_seguidos", 0) + 1 if data.get("ultimo_dia") == ontem else 1
+            data["ultimo_dia"] = evento["data"]
+    data["last_active"] = evento["ts"]
+
+
+class JsonlProgressStore:
+    """Progress kept as a JSON snapshot plus an append-only JSONL event log.
+
+    Every event gets a sequence number; the snapshot records the last one
+    it contains, so a crash between writing the snapshot and truncating the
+    log never replays an event twice. All writers take an exclusive flock
+    on the .seq file, which makes concurrent sessions and processes safe.
+    """
+
+    def __init__(self, snapshot_path):
+        self.snapshot_path = snapshot_path
+        base = os.path.splitext(snapshot_path)[0]
+        self.log_path = base + ".events.jsonl"
+        self.seq_path = base + ".seq"
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _trava(self):
+        with self._lock, open(self.seq_path, "a+", encoding="utf-8") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                yield f
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _ler_snapshot(self):
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                return _completar_progresso(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError, IOError):
+            return progresso_padrao()
+
+    def _reconstruir(self):
+        data = self._ler_snapshot()
+        ultimo = data.get("seq", 0)
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        evento = json.loads(linha)
+                    except json.JSONDecodeError:
+                        continue  # torn line from a crashed writer
+                    if evento.get("seq", 0) > ultimo:
+                        aplicar_evento(data, evento)
+                        ultimo = evento["seq"]
+        except FileNotFoundError:
+            pass
+        data["seq"] = ultimo
+        return data
+
+    def _compactar(self, seq_file):
+        data = self._reconstruir()
+        _gravar_arquivo_atomico(self.snapshot_path,
+                                progresso_json(data, indent=4).encode("utf-8"))
+        open(self.log_path, "w").close()
+        seq_file.seek(0)
+        seq_file.truncate()
+        seq_file.write(str(data["seq"]))
+        seq_file.flush()
+
+    def load(self):
+        with self._trava():
+            return self._reconstruir()
+
+    def _ultimo_seq(self, seq_file):
+        """Last sequence number handed out; rebuilt from the log if .seq is unusable"""
+        try:
+            return int(seq_file.read().strip())
+        except ValueError:
+            # Missing, or emptied by a crash between truncate and write
+            return self._reconstruir()["seq"]
+
+    def append(self, eventos):
+        """Append events with O(1) work; compacts when the log gets large"""
+        with self._trava() as seq_file:
+            seq = self._ultimo_seq(seq_file)
+            linhas = []
+            for evento in eventos:
+                seq += 1
+                linhas.append(json.dumps({**evento, "seq": seq}, ensure_ascii=False))
+            # Reserve the numbers before logging: a crash in between leaves a
+            # gap, never a number used twice
+            seq_file.seek(0)
+            seq_file.truncate()
+            seq_file.write(str(seq))
+            seq_file.flush()
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write("\n".join(linhas) + "\n")
+            if os.path.getsize(self.log_path) > PROGRESS_COMPACT_BYTES:
+                self._compactar(seq_file)
+            return seq
+
+
+class JsonlProgressBackend:
+    """One JsonlProgressStore per user; the default user keeps user_progress.json"""
+
+    def __init__(self, snapshot_path):
+        self.snapshot_path = snapshot_path
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    def _store(self, user_id):
+        with self._lock:
+            if user_id not in self._stores:
+                base, ext = os.path.splitext(self.snapshot_path)
+                path = self.snapshot_path if user_id == DEFAULT_USER else f"{base}.{user_id}{ext}"
+                self._stores[user_id] = JsonlProgressStore(path)
+            return self._stores[user_id]
+
+    def load(self, user_id):
+        return self._store(user_id).load()
+
+    def append(self, user_id, eventos):
+        return self._store(user_id).append(eventos)
+
+    def add_history(self, user_id, linha):
+        path = os.path.splitext(self._store(user_id).snapshot_path)[0] + ".history.jsonl"
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(linha, ensure_ascii=False) + "\n")
+
+    def recent_history(self, user_id, limite=HISTORY_LOAD_LIMIT):
+        path = os.path.splitext(self._store(user_id).snapshot_path)[0] + ".history.jsonl"
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                linhas = deque(f, maxlen=limite)
+        except FileNotFoundError:
+            return []
+        return [json.loads(linha) for linha in linhas if linha.strip()]
+
+    def difficult_words(self, user_id):
+        return dict(self.load(user_id).get("difficult_words", {}))
+
+    def _vocab_path(self):
+        return os.path.splitext(self.snapshot_path)[0] + ".vocab.json"
+
+    def palavras_vocab(self, desde=0):
+        """Registered vocabulary words from position desde on (see RegistroVocab)"""
+        try:
+            with open(self._vocab_path(), "r", encoding="utf-8") as f:
+                return json.load(f)[desde:]
+        except FileNotFoundError:
+            return []
+
+    def adicionar_vocab(self, palavras):
+        path = self._vocab_path()
+        with self._lock, open(os.path.splitext(path)[0] + ".lock", "a", encoding="utf-8") as trava:
+            if fcntl:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+            registradas = self.palavras_vocab()
+            conhecidas = set(registradas)
+            novas = [p for p in palavras if p not in conhecidas]
+            if novas:
+                _gravar_arquivo_atomico(path, json.dumps(registradas + novas, ensure_ascii=False)
+                                        .encode("utf-8"))
+
+    def gravar_lote(self, user_id, eventos=(), historico=(), dificeis=None):
+        ts = datetime.now().isoformat()
+        eventos = list(eventos) + [{"tipo": "dificil", "palavra": palavra, "ts": ts}
+                                   for palavra, n in (dificeis or {}).items() for _ in range(n)]
+        if eventos:
+            self.append(user_id, eventos)
+        for linha in historico:
+            self.add_history(user_id, linha)
+
+
+class SqliteProgressStore:
+    """Per-user progress, history and difficult words in one SQLite database.
+
+    Runs in WAL mode so readers never block the writer; connections come
+    from a small pool shared by every session in the process. Progress uses
+    the same snapshot + event log scheme as JsonlProgressStore, one
+    snapshot row per user.
+    """
+
+    POOL_SIZE = 8
+    COMPACT_EVERY = 200
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS progress (
+        user_id TEXT PRIMARY KEY,
+        data TEXT NOT NULL,
+        seq INTEGER NOT NULL DEFAULT 0,
+        pending INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT
+    );
+    CREATE TABLE IF NOT EXISTS events (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        payload TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_events_user ON events (user_id, seq);
+    CREATE TABLE IF NOT EXISTS history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        ts TEXT NOT NULL,
+        dados TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_history_user ON history (user_id, id);
+    CREATE TABLE IF NOT EXISTS difficult_words (
+        user_id TEXT NOT NULL,
+        palavra TEXT NOT NULL,
+        erros INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, palavra)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS vocab_index (
+        posicao INTEGER PRIMARY KEY,
+        palavra TEXT NOT NULL UNIQUE
+    );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._pool = queue.LifoQueue(maxsize=self.POOL_SIZE)
+        with self._conexao() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _abrir(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=10000")
+        return conn
+
+    @contextmanager
+    def _conexao(self):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._abrir()
+        try:
+            yield conn
+        finally:
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def _transacao(self):
+        with self._conexao() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _reconstruir(self, conn, user_id):
+        linha = conn.execute("SELECT data, seq FROM progress WHERE user_id = ?", (user_id,)).fetchone()
+        if linha is None:
+            return None
+        data = _completar_progresso(json.loads(linha[0]))
+        data["seq"] = linha[1]
+        for seq, payload in conn.execute(
+                "SELECT seq, payload FROM events WHERE user_id = ? AND seq > ? ORDER BY seq",
+                (user_id, linha[1])):
+            aplicar_evento(data, json.loads(payload))
+            data["seq"] = seq
+        return data
+
+    def _gravar_snapshot(self, conn, user_id, data):
+        conn.execute(
+            "INSERT INTO progress (user_id, data, seq, pending, updated_at) VALUES (?, ?, ?, 0, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET data = excluded.data, seq = excluded.seq, "
+            "pending = 0, updated_at = excluded.updated_at",
+            (user_id, progresso_json(data), data.get("seq", 0), datetime.now().isoformat()))
+        conn.execute("DELETE FROM events WHERE user_id = ? AND seq <= ?", (user_id, data.get("seq", 0)))
+
+    def load(self, user_id):
+        with self._conexao() as conn:
+            data = self._reconstruir(conn, user_id)
+        if data is not None:
+            return data
+        # First visit: start empty, importing the legacy single-user file if present
+        data = JsonlProgressStore(USER_DATA_FILE).load() if user_id == DEFAULT_USER else progresso_padrao()
+        data["seq"] = 0
+        with self._transacao() as conn:
+            existente = self._reconstruir(conn, user_id)
+            if existente is not None:
+                return existente
+            conn.execute("INSERT INTO progress (user_id, data, seq, updated_at) VALUES (?, ?, 0, ?)",
+                         (user_id, progresso_json(data), datetime.now().isoformat()))
+            # Picks up events appended before the first load, if any
+            return self._reconstruir(conn, user_id)
+
+    def append(self, user_id, eventos):
+        return self.gravar_lote(user_id, eventos=eventos)
+
+    def gravar_lote(self, user_id, eventos=(), historico=(), dificeis=None):
+        """Write events, history rows and difficult-word counts in one transaction"""
+        with self._transacao() as conn:
+            seq = 0
+            for evento in eventos:
+                seq = conn.execute("INSERT INTO events (user_id, payload) VALUES (?, ?)",
+                                   (user_id, json.dumps(evento, ensure_ascii=False))).lastrowid
+            if historico:
+                ts = datetime.now().isoformat()
+                conn.executemany("INSERT INTO history (user_id, ts, dados) VALUES (?, ?, ?)",
+                                 [(user_id, ts, json.dumps(linha, ensure_ascii=False)) for linha in historico])
+            if dificeis:
+                conn.executemany("INSERT INTO difficult_words (user_id, palavra, erros) VALUES (?, ?, ?) "
+                                 "ON CONFLICT (user_id, palavra) DO UPDATE SET erros = erros + excluded.erros",
+                                 [(user_id, palavra, n) for palavra, n in dificeis.items()])
+            if eventos:
+                # Plain UPDATE + SELECT: RETURNING needs SQLite 3.35 (bullseye ships 3.34)
+                conn.execute("UPDATE progress SET pending = pending + ? WHERE user_id = ?",
+                             (len(eventos), user_id))
+                pendentes = conn.execute("SELECT pending FROM progress WHERE user_id = ?",
+                                         (user_id,)).fetchone()
+                if pendentes and pendentes[0] >= self.COMPACT_EVERY:
+                    self._gravar_snapshot(conn, user_id, self._reconstruir(conn, user_id))
+            return seq
+
+    def add_history(self, user_id, linha):
+        self.gravar_lote(user_id, historico=[linha])
+
+    def recent_history(self, user_id, limite=HISTORY_LOAD_LIMIT):
+        with self._conexao() as conn:
+            linhas = conn.execute("SELECT dados FROM history WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+                                  (user_id, limite)).fetchall()
+        return [json.loads(dados) for (dados,) in reversed(linhas)]
+
+    def difficult_words(self, user_id):
+        with self._conexao() as conn:
+            return dict(conn.execute("SELECT palavra, erros FROM difficult_words WHERE user_id = ?",
+                                     (user_id,)).fetchall())
+
+    def palavras_vocab(self, desde=0):
+        """Registered vocabulary words from position desde on (see RegistroVocab)"""
+        with self._conexao() as conn:
+            return [palavra for (palavra,) in conn.execute(
+                "SELECT palavra FROM vocab_index WHERE posicao >= ? ORDER BY posicao", (desde,))]
+
+    def adicionar_vocab(self, palavras):
+        with self._transacao() as conn:
+            # Next position = current size; the write lock keeps positions gapless
+            conn.executemany("INSERT OR IGNORE INTO vocab_index (posicao, palavra) "
+                             "SELECT COUNT(*), ? FROM vocab_index", [(p,) for p in palavras])
+
+
+@st.cache_resource
+def get_progress_store():
+    if PROGRESS_BACKEND == "jsonl":
+        return JsonlProgressBackend(USER_DATA_FILE)
+    return SqliteProgressStore(PROGRESS_DB)
+
+
+def normalizar_usuario(nome):
+    nome = re.sub(r"[^a-z0-9_.-]+", "_", (nome or "").strip().lower()).strip("._")
+    return nome[:64] or DEFAULT_USER
+
+
+class ProgressWriter:
+    """Write-behind buffer shared by all sessions.
+
+    Mutations are queued per user and coalesced into a single store write
+    once the user has been idle for FLUSH_DEBOUNCE seconds (or the batch
+    is old or large enough). A background thread does the flushing; a
+    session that ends has its users flushed right away (see GuardaSessao),
+    and everything left is flushed when the process exits.
+    """
+
+    FLUSH_DEBOUNCE = 0.5
+    FLUSH_MAX_AGE = 3.0
+    FLUSH_MAX_ITEMS = 100
+
+    def __init__(self, store):
+        self.store = store
+        self._pendentes = {}
+        self._cond = threading.Condition()
+        self._escrita = threading.Lock()
+        threading.Thread(target=self._loop, name="progress-writer", daemon=True).start()
+        atexit.register(self.flush)
+
+    def enfileirar(self, user_id, eventos=(), historico=(), dificeis=()):
+        agora = time.monotonic()
+        with self._cond:
+            lote = self._pendentes.get(user_id)
+            if lote is None:
+                lote = self._pendentes[user_id] = {"eventos": [], "historico": [], "dificeis": Counter(),
+                                                   "desde": agora}
+            lote["eventos"].extend(eventos)
+            lote["historico"].extend(historico)
+            lote["dificeis"].update(dificeis)
+            lote["ultimo"] = agora
+            self._cond.notify()
+
+    def encerrar(self, usuarios):
+        """Make these users' batches due now; the writer thread flushes them"""
+        with self._cond:
+            for user_id in usuarios:
+                lote = self._pendentes.get(user_id)
+                if lote is not None:
+                    lote["desde"] = float("-inf")
+            self._cond.notify()
+
+    def _tamanho(self, lote):
+        return len(lote["eventos"]) + len(lote["historico"]) + len(lote["dificeis"])
+
+    def _prontos(self, agora):
+        return [user_id for user_id, lote in self._pendentes.items()
+                if agora - lote["ultimo"] >= self.FLUSH_DEBOUNCE
+                or agora - lote["desde"] >= self.FLUSH_MAX_AGE
+                or self._tamanho(lote) >= self.FLUSH_MAX_ITEMS]
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait(timeout=self.FLUSH_DEBOUNCE)
+                if not self._prontos(time.monotonic()):
+                    continue
+            self._flush(lambda agora: self._prontos(agora))
+
+    def flush(self, user_id=None):
+        """Write pending mutations now (one user, or everyone)"""
+        self._flush(lambda agora: [u for u in self._pendentes if user_id is None or u == user_id])
+
+    def _flush(self, selecionar):
+        # Popping and writing under one lock keeps batches for a user in order
+        with self._escrita:
+            with self._cond:
+                lotes = [(u, self._pendentes.pop(u)) for u in selecionar(time.monotonic())]
+            for user_id, lote in lotes:
+                try:
+                    self.store.gravar_lote(user_id, lote["eventos"], lote["historico"], lote["dificeis"])
+                except Exception:
+                    # Anything escaping here would kill the writer thread and drop the batch
+                    logging.getLogger(__name__).exception("Falha ao salvar progresso de %s", user_id)
+                    self._devolver(user_id, lote)
+
+    def _devolver(self, user_id, lote):
+        with self._cond:
+            novo = self._pendentes.get(user_id)
+            if novo is not None:
+                lote["eventos"].extend(novo["eventos"])
+                lote["historico"].extend(novo["historico"])
+                lote["dificeis"].update(novo["dificeis"])
+            lote["desde"] = lote["ultimo"] = time.monotonic()
+            self._pendentes[user_id] = lote
+
+
+@st.cache_resource
+def get_progress_writer():
+    return ProgressWriter(get_progress_store())
+
+
+class GuardaSessao:
+    """Kept in session_state; when Streamlit drops the session, the users it
+    loaded are flushed without waiting for the debounce."""
+
+    __slots__ = ("usuarios", "__weakref__")
+
+    def __init__(self, writer):
+        self.usuarios = set()
+        weakref.finalize(self, writer.encerrar, self.usuarios)
+
+
+def load_user_progress(user_id=DEFAULT_USER):
+    get_progress_writer().flush(user_id)  # read your own queued writes
+    data = get_progress_store().load(user_id)
+    data["user_id"] = user_id
+    return data
+
+
+def registrar_evento(progress, tipo, **dados):
+    """Apply an event to the in-memory progress and queue it for the store"""
+    evento = {"tipo": tipo, "ts": datetime.now().isoformat(), **dados}
+    aplicar_evento(progress, evento)
+    get_progress_writer().enfileirar(progress.get("user_id", DEFAULT_USER), eventos=[evento])
+
+
+def registrar_historico(progress, linha):
+    st.session_state.history.append(linha)
+    get_progress_writer().enfileirar(progress.get("user_id", DEFAULT_USER), historico=[linha])
+
+
+class HistoricoSessao:
+    """Bounded, column-oriented history of the current session.
+
+    Each column is a preallocated numpy array used as a ring buffer, so
+    appending is O(1), memory stays fixed however long the session runs,
+    and a table page is assembled from array slices instead of rebuilding
+    a DataFrame from a list of dicts on every rerun.
+    """
+
+    __slots__ = ("capacidade", "colunas", "inicio", "tamanho", "total")
+
+    TEXTO = ("nivel", "pergunta", "resposta_correta", "resposta_usuario", "resultado", "variante")
+    NUMERO = ("similaridade", "duracao_audio")
+
+    def __init__(self, capacidade=HISTORY_SESSION_LIMIT, linhas=()):
+        self.capacidade = capacidade
+        self.colunas = {nome: np.full(capacidade, "", dtype=object) for nome in self.TEXTO}
+        self.colunas.update({nome: np.full(capacidade, np.nan) for nome in self.NUMERO})
+        self.inicio = self.tamanho = self.total = 0
+        for linha in linhas:
+            self.append(linha)
+
+    def __len__(self):
+        return self.tamanho
+
+    def append(self, linha):
+        if self.tamanho < self.capacidade:
+            pos = (self.inicio + self.tamanho) % self.capacidade
+            self.tamanho += 1
+        else:  # full: overwrite the oldest row
+            pos = self.inicio
+            self.inicio = (self.inicio + 1) % self.capacidade
+        for nome in self.TEXTO:
+            self.colunas[nome][pos] = linha.get(nome, "")
+        for nome in self.NUMERO:
+            valor = linha.get(nome)
+            self.colunas[nome][pos] = np.nan if valor is None else valor
+        self.total += 1
+
+    def paginas(self, por_pagina=HISTORY_PAGE_SIZE):
+        return max(1, -(-self.tamanho // por_pagina))
+
+    def pagina(self, numero=0, por_pagina=HISTORY_PAGE_SIZE):
+        """DataFrame of one page, newest rows first (page 0 is the latest)"""
+        fim = self.tamanho - numero * por_pagina
+        posicoes = (self.inicio + np.arange(fim - 1, max(fim - por_pagina, 0) - 1, -1)) % self.capacidade
+        df = pd.DataFrame({nome: coluna[posicoes] for nome, coluna in self.colunas.items()})
+        # Columns nobody filled in (e.g. no audio answers yet) are left out
+        return df.loc[:, [nome for nome in df.columns if nome in self.TEXTO or df[nome].notna().any()]]
+
+
+# Function words are in almost every answer; a miss on them says nothing
+# about which phrase needs review, so they are never tracked as difficult
+PALAVRAS_COMUNS = frozenset("""
+a an the i you he she it we they me him her us them my your his its our their
+am is are was were be been do does did have has had will would shall should can could
+may might must to of in on at by for with from up about into over and or but so
+not no yes ok okay please this that these those there here what which who when where
+how i'm it's let's don't
+""".split())
+
+
+def palavras_de_conteudo(trecho):
+    """Normalized words of trecho worth tracking on their own"""
+    return [p for p in normalizar(trecho).split() if len(p) > 1 and p not in PALAVRAS_COMUNS]
+
+
+def registrar_palavras_dificeis(progress, trechos):
+    palavras = [p for trecho in trechos for p in palavras_de_conteudo(trecho)]
+    if not palavras:
+        return
+    for palavra in palavras:
+        st.session_state.difficult_words[palavra] = st.session_state.difficult_words.get(palavra, 0) + 1
+    get_progress_writer().enfileirar(progress.get("user_id", DEFAULT_USER), dificeis=palavras)
+
+
+@dataclass(frozen=True)
+class TabelaNiveis:
+    """Levels sorted by XP threshold, looked up by bisection.
+
+    info() is O(log levels) per learner and em_lote() runs the same search
+    over a whole array of XP values with numpy, so tables with hundreds of
+    levels cost nothing noticeable on a rerun or a leaderboard.
+    """
+
+    niveis: Mapping[int, dict]  # level number -> {"name", "icon", "xp_needed"}
+    numeros: tuple              # level numbers in threshold order
+    limiares: tuple             # xp_needed, ascending
+
+    @classmethod
+    def de_niveis(cls, niveis):
+        ordem = sorted(niveis.items(), key=lambda item: (item[1]["xp_needed"], item[0]))
+        return cls(MappingProxyType(dict(ordem)), tuple(n for n, _ in ordem),
+                   tuple(info["xp_needed"] for _, info in ordem))
+
+    @classmethod
+    def de_config(cls, config):
+        """From a levels file: an explicit "levels" list, or a geometric "curve" over "tiers".
+
+        Raises ValueError for a table info() cannot serve: empty, or not
+        starting at 0 XP.
+        """
+        tabela = cls._de_config(config)
+        if not tabela.limiares:
+            raise ValueError("no levels defined")
+        if tabela.limiares[0] != 0:
+            raise ValueError(f"lowest xp_needed must be 0, got {tabela.limiares[0]}")
+        return tabela
+
+    @classmethod
+    def _de_config(cls, config):
+        if "levels" in config:
+            return cls.de_niveis({i: {"name": nivel["name"], "icon": nivel.get("icon", "⭐"),
+                                      "xp_needed": int(nivel["xp_needed"])}
+                                  for i, nivel in enumerate(config["levels"], start=1)})
+        curva = config["curve"]
+        total, base, crescimento = int(curva["levels"]), float(curva["base"]), float(curva.get("growth", 1.0))
+        tiers = config.get("tiers") or [{"name": "Level", "icon": "⭐"}]
+        niveis = {}
+        for n in range(1, total + 1):
+            passos = n - 1
+            # XP for level n is base * (1 + g + g^2 + ... + g^(n-2))
+            xp = base * passos if crescimento == 1.0 else base * (crescimento ** passos - 1) / (crescimento - 1)
+            tier = tiers[(n - 1) * len(tiers) // total]
+            niveis[n] = {"name": f"{tier['name']} {n}", "icon": tier.get("icon", "⭐"), "xp_needed": round(xp)}
+        return cls.de_niveis(niveis)
+
+    def _posicao(self, xp):
+        return max(bisect.bisect_right(self.limiares, xp) - 1, 0)
+
+    def info(self, xp):
+        """(level, next_level, xp_current, xp_next, progress) for one XP value"""
+        i = self._posicao(xp)
+        j = min(i + 1, len(self.limiares) - 1)
+        xp_current, xp_next = self.limiares[i], self.limiares[j]
+        progress = (xp - xp_current) / (xp_next - xp_current) if xp_next > xp_current else 1.0
+        return self.numeros[i], self.numeros[j], xp_current, xp_next, progress
+
+    def em_lote(self, xps):
+        """Vectorized info(): one array per field, for leaderboards and reports"""
+        xps = np.asarray(xps)
+        limiares = np.asarray(self.limiares)
+        numeros = np.asarray(self.numeros)
+        i = np.maximum(np.searchsorted(limiares, xps, side="right") - 1, 0)
+        j = np.minimum(i + 1, len(limiares) - 1)
+        faixa = limiares[j] - limiares[i]
+        progress = np.where(faixa > 0, (xps - limiares[i]) / np.where(faixa > 0, faixa, 1), 1.0)
+        return numeros[i], numeros[j], limiares[i], limiares[j], progress
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _montar_niveis(path, assinatura):
+    config = _ler_json(path) if assinatura else {}
+    if config:
+        try:
+            return TabelaNiveis.de_config(config)
+        except (KeyError, TypeError, ValueError) as e:
+            logging.warning("ignoring invalid %s: %s", path, e)
+    return TabelaNiveis.de_niveis(LEVELS)
+
+
+# path -> (monotonic time of the last check, table). Under `streamlit run`
+# this starts empty on every rerun, so each run stats the file once.
+_niveis_vistos = {}
+LEVELS_RECHECK_SECONDS = 1.0
+
+
+def carregar_niveis(path=LEVELS_FILE):
+    """Level table, built once per process and rebuilt only when the file changes.
+
+    The file is stat'ed at most once per run (or per second when imported),
+    so repeated lookups cost a dict access instead of a syscall.
+    """
+    agora = time.monotonic()
+    visto = _niveis_vistos.get(path)
+    if visto is None or agora - visto[0] > LEVELS_RECHECK_SECONDS:
+        visto = _niveis_vistos[path] = (agora, _montar_niveis(path, _assinatura_arquivo(path)))
+    return visto[1]
 
 
 def get_level_info(xp):
-    current_level = 1
-    for lvl, info in sorted(LEVELS.items(), reverse=True):
-        if xp >= info["xp_needed"]:
-            current_level = lvl
-            break
-    next_level = current_level + 1 if current_level < max(LEVELS.keys()) else current_level
-    xp_for_next = LEVELS.get(next_level, {}).get("xp_needed", LEVELS[current_level]["xp_needed"] + 500)
-    xp_current = LEVELS[current_level]["xp_needed"]
-    progress = (xp - xp_current) / (xp_for_next - xp_current) if xp_for_next > xp_current else 1.0
-    return current_level, next_level, xp_current, xp_for_next, progress
+    return carregar_niveis().info(xp)
 
 
-def check_achievements(progress, session_state):
-    new_achievements = []
-    total_correct = sum(progress["acertos"].values())
+def disparar_conquistas(progress, session_state, *eventos):
+    """Evaluate only the rules subscribed to these events; returns new unlocks"""
+    novas = []
+    for evento in eventos:
+        for regra in REGRAS_POR_EVENTO.get(evento, ()):
+            if regra.id in progress["achievements"] or regra.id in novas:
+                continue
+            if CONTADORES[regra.contador](progress, session_state) >= regra.meta:
+                novas.append(regra.id)
+                registrar_evento(progress, "conquista", id=regra.id)
+    return novas
 
-    if total_correct >= 1 and "first_blood" not in progress["achievements"]:
-        new_achievements.append("first_blood")
-    if session_state.get("streak", 0) >= 5 and "perfect_streak_5" not in progress["achievements"]:
-        new_achievements.append("perfect_streak_5")
-    if session_state.get("streak", 0) >= 10 and "perfect_streak_10" not in progress["achievements"]:
-        new_achievements.append("perfect_streak_10")
-    vocab_seen_count = len(progress.get("vocab_seen", []))
-    if vocab_seen_count >= 50 and "vocab_50" not in progress["achievements"]:
-        new_achievements.append("vocab_50")
-    if vocab_seen_count >= 100 and "vocab_100" not in progress["achievements"]:
-        new_achievements.append("vocab_100")
-    if progress.get("audio_used", 0) >= 10 and "audio_master" not in progress["achievements"]:
-        new_achievements.append("audio_master")
 
-    for ach in new_achievements:
-        progress["achievements"].append(ach)
+def marcar_dia_ativo(progress):
+    """Log today's activity once per day; True if this is the first time today"""
+    hoje = date.today().isoformat()
+    if progress.get("ultimo_dia") == hoje:
+        return False
+    registrar_evento(progress, "dia", data=hoje)
+    return True
 
-    return new_achievements
+
+def conquistas_da_resposta(progress, session_state, correta, audio=False):
+    eventos = ["day_active"] if marcar_dia_ativo(progress) else []
+    if correta:
+        eventos.append("answer_correct")
+        if audio:
+            eventos.append("audio_used")
+    return disparar_conquistas(progress, session_state, *eventos)
 
 
 # ============================================
@@ -454,13 +1024,16 @@ def check_achievements(progress, session_state):
 SAMPLE_FRASES = {
     "Fácil": [
         {"pergunta_en": "Where is the packing list?", "resposta_en": "It is on the desk.", 
-         "pergunta_pt": "Onde está a lista de embalagem?", "resposta_pt": "Está na mesa."},
+         "pergunta_pt": "Onde está a lista de embalagem?", "resposta_pt": "Está na mesa.",
+         "respostas_aceitas": ["It's on the desk.", "The packing list is on the desk."]},
         {"pergunta_en": "Can I help you?", "resposta_en": "Yes, I need the inventory report.", 
          "pergunta_pt": "Posso ajudar?", "resposta_pt": "Sim, preciso do relatório de inventário."},
         {"pergunta_en": "What time does the shift start?", "resposta_en": "It starts at 8 AM.", 
-         "pergunta_pt": "Que horas começa o turno?", "resposta_pt": "Começa às 8h."},
+         "pergunta_pt": "Que horas começa o turno?", "resposta_pt": "Começa às 8h.",
+         "respostas_aceitas": ["It starts at 8.", "The shift starts at 8 AM.", "At 8 AM."]},
         {"pergunta_en": "Is the shipment ready?", "resposta_en": "Yes, it is ready for dispatch.", 
-         "pergunta_pt": "A remessa está pronta?", "resposta_pt": "Sim, está pronta para despacho."},
+         "pergunta_pt": "A remessa está pronta?", "resposta_pt": "Sim, está pronta para despacho.",
+         "respostas_aceitas": ["Yes, it's ready for dispatch.", "Yes, it is ready to ship."]},
     ],
     "Médio": [
         {"pergunta_en": "Could you verify the quantity against the purchase order?", 
@@ -519,72 +1092,1227 @@ SAMPLE_VOCAB = {
     ]
 }
 
+# ============================================
+# CORPUS
+# ============================================
+
+FRASES_FILE = "frases.json"
+VOCAB_FILE = "Vocabulario.json"
+
+
+@dataclass(frozen=True)
+class Corpus:
+    """Read-only phrase/vocabulary views shared by every session.
+
+    Do not mutate the phrase dicts: the same objects are handed to all users.
+    """
+
+    frases_por_nivel: Mapping[str, tuple]
+    vocab_por_topico: Mapping[str, tuple]
+    # normalizar(resposta_en) -> ((nivel, frase), ...), one entry per level using it
+    por_resposta: Mapping[str, tuple]
+    # nivel -> ids (normalized answers) of its phrases, used by the scheduler
+    ids_por_nivel: Mapping[str, tuple]
+    # id -> RespostasAceitas with every accepted answer precomputed
+    referencias_por_id: Mapping[str, "RespostasAceitas"]
+    # normalized word -> ids of the phrases whose answer contains it
+    ids_por_palavra: Mapping[str, tuple]
+    # IndiceSemantico over every accepted answer when SCORING_MODE=semantico
+    semantico: object = None
+
+    def frases(self, nivel):
+        return self.frases_por_nivel.get(nivel, ())
+
+    def id_de(self, frase):
+        """Normalized answer identifying frase (memoized by normalizar)"""
+        return normalizar(frase["resposta_en"])
+
+    def referencias(self, frase):
+        """Accepted answers of frase (built on the fly for phrases outside the corpus)"""
+        refs = self.referencias_por_id.get(self.id_de(frase))
+        return refs if refs is not None else RespostasAceitas.de_frase(frase)
+
+    def ocorrencias(self, resposta):
+        """(nivel, frase) pairs whose expected answer is resposta"""
+        return self.por_resposta.get(normalizar(resposta), ())
+
+    def buscar_resposta(self, resposta, nivel=None):
+        """O(1) phrase lookup by expected answer, optionally limited to one level"""
+        for nivel_frase, frase in self.ocorrencias(resposta):
+            if nivel is None or nivel_frase == nivel:
+                return frase
+        return None
+
+
+def _assinatura_arquivo(path):
+    """(mtime, size) of path, or None if missing; changes invalidate the cache"""
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return info.st_mtime_ns, info.st_size
+
+
+def _ler_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError, IOError):
+        return {}
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _montar_corpus(frases_path, frases_assinatura, vocab_path, vocab_assinatura, incluir_exemplos):
+    frases_fontes = ([SAMPLE_FRASES] if incluir_exemplos else []) + [_ler_json(frases_path)]
+    vocab_fontes = ([SAMPLE_VOCAB] if incluir_exemplos else []) + [_ler_json(vocab_path)]
+
+    niveis = {}
+    for fonte in frases_fontes:
+        for nivel, frases in fonte.items():
+            vistos = niveis.setdefault(nivel, {})
+            for frase in frases:
+                vistos.setdefault((frase.get("pergunta_en"), frase.get("resposta_en")), frase)
+    frases_por_nivel = {nivel: tuple(vistos.values()) for nivel, vistos in niveis.items()}
+
+    topicos = {}
+    for fonte in vocab_fontes:
+        for topico, palavras in fonte.items():
+            topicos.setdefault(topico, []).extend(palavras)
+    get_registro_vocab().registrar(normalizar(p["en"]) for palavras in topicos.values() for p in palavras)
+
+    por_resposta = {}
+    ids_por_nivel = {}
+    referencias = {}
+    ids_por_palavra = {}
+    for nivel, frases in frases_por_nivel.items():
+        ids = {}
+        for frase in frases:
+            chave = normalizar(frase["resposta_en"])
+            if chave in ids:
+                continue  # same answer twice in one level: the first phrase wins
+            ids[chave] = None
+            if chave not in referencias:
+                referencias[chave] = RespostasAceitas.de_frase(frase)
+                for palavra in set(chave.split()):
+                    ids_por_palavra.setdefault(palavra, []).append(chave)
+            por_resposta.setdefault(chave, []).append((nivel, frase))
+        ids_por_nivel[nivel] = tuple(ids)
+
+    return Corpus(
+        frases_por_nivel=MappingProxyType(frases_por_nivel),
+        vocab_por_topico=MappingProxyType({t: tuple(p) for t, p in topicos.items()}),
+        por_resposta=MappingProxyType({k: tuple(v) for k, v in por_resposta.items()}),
+        ids_por_nivel=MappingProxyType(ids_por_nivel),
+        referencias_por_id=MappingProxyType(referencias),
+        ids_por_palavra=MappingProxyType({k: tuple(v) for k, v in ids_por_palavra.items()}),
+        semantico=IndiceSemantico.carregar(referencias) if SCORING_MODE == "semantico" else None,
+    )
+
+
+def carregar_corpus(frases_path=FRASES_FILE, vocab_path=VOCAB_FILE, incluir_exemplos=True):
+    """Parsed corpus, built once per process and rebuilt only when a file changes"""
+    return _montar_corpus(frases_path, _assinatura_arquivo(frases_path),
+                          vocab_path, _assinatura_arquivo(vocab_path), incluir_exemplos)
+
+
+# ============================================
+# SPACED REPETITION (SM-2)
+# ============================================
+
+SRS_EASE_INICIAL = 2.5
+SRS_EASE_MINIMA = 1.3
+# A failed phrase comes back within the same session
+SRS_REAPRENDER_SEGUNDOS = 10 * 60
+# A due phrase skipped without an answer waits this long before coming back
+SRS_ADIAR_SEGUNDOS = 2 * 60
+# Difficult words found in more than this share of the phrases seed nothing
+SRS_PALAVRA_MAX_FRACAO = 0.1
+DIA = 24 * 60 * 60
+
+
+def qualidade_resposta(status, sim):
+    """Map a verification result onto the SM-2 0-5 grade (None = not a review)"""
+    if status == "success":
+        return 5
+    if status == "info":
+        return 3 if sim >= 0.9 else 2
+    if status == "error":
+        return 1 if sim >= 0.5 else 0
+    return None
+
+
+def sm2(estado, qualidade, agora):
+    """Next [intervalo_dias, ease, repeticoes, due_ts] after a review graded 0-5"""
+    intervalo, ease, repeticoes, _ = estado
+    ease = max(SRS_EASE_MINIMA, ease + 0.1 - (5 - qualidade) * (0.08 + (5 - qualidade) * 0.02))
+    if qualidade < 3:
+        return [0, ease, 0, agora + SRS_REAPRENDER_SEGUNDOS]
+    if repeticoes == 0:
+        intervalo = 1
+    elif repeticoes == 1:
+        intervalo = 6
+    else:
+        intervalo = round(intervalo * ease)
+    return [intervalo, ease, repeticoes + 1, agora + intervalo * DIA]
+
+
+class ReviewScheduler:
+    """Picks the next phrase of a level: due reviews first, then unseen ones.
+
+    Review state is kept per item id as [intervalo_dias, ease, repeticoes,
+    due_ts]; due items sit in a min-heap keyed by due time with lazy
+    deletion, so picking and rescheduling are O(log n) however large the
+    deck gets.
+    """
+
+    def __init__(self, itens, estados):
+        self.estados = {item: estados[item] for item in itens if item in estados}
+        self._heap = [(estado[3], item) for item, estado in self.estados.items()]
+        heapq.heapify(self._heap)
+        novos = [item for item in itens if item not in self.estados]
+        random.shuffle(novos)
+        self._novos = deque(novos)
+
+    @classmethod
+    def para_nivel(cls, corpus, progress, nivel, difficult_words, agora=None):
+        """Build from persisted SRS state, seeding unseen items from old stats"""
+        agora = agora or time.time()
+        estados = dict(progress.get("srs", {}))
+        erros = Counter({normalizar(k): v for k, v in progress.get("erros", {}).items()})
+        # A word shared by too many phrases does not single any of them out
+        limite = max(3, SRS_PALAVRA_MAX_FRACAO * len(corpus.referencias_por_id))
+        for palavra, n in difficult_words.items():
+            chave = normalizar(palavra)
+            if chave in PALAVRAS_COMUNS:
+                continue
+            # Words missed elsewhere weigh on every phrase that uses them
+            itens = corpus.ids_por_palavra.get(chave, ())
+            if len(itens) > limite:
+                continue
+            for item in itens:
+                erros[item] = max(erros[item], n)
+        acertos = {normalizar(k) for k in progress.get("acertos", {})}
+        for item in corpus.ids_por_nivel.get(nivel, ()):
+            if item in estados:
+                continue
+            if erros[item]:
+                # Struggled before: lower ease and make it due right away
+                ease = max(SRS_EASE_MINIMA, SRS_EASE_INICIAL - 0.15 * min(erros[item], 5))
+                estados[item] = [0, ease, 0, agora]
+            elif item in acertos:
+                estados[item] = [1, SRS_EASE_INICIAL, 1, agora + DIA]
+        return cls(corpus.ids_por_nivel.get(nivel, ()), estados)
+
+    def _topo_valido(self):
+        while self._heap:
+            due, item = self._heap[0]
+            if self.estados[item][3] == due:
+                return self._heap[0]
+            heapq.heappop(self._heap)  # superseded by a later review
+        return None
+
+    def _proximo_devido(self, agora, excluir):
+        topo = self._topo_valido()
+        if topo is None or topo[1] != excluir:
+            return topo
+        # Peek past the phrase currently on screen, then restore it
+        heapq.heappop(self._heap)
+        segundo = self._topo_valido()
+        heapq.heappush(self._heap, topo)
+        return segundo
+
+    def proximo(self, agora=None, excluir=None):
+        """Id of the next item to show, never excluir unless it is the only one"""
+        agora = agora or time.time()
+        devido = self._proximo_devido(agora, excluir)
+        if devido is not None and devido[0] <= agora:
+            return devido[1]
+        while self._novos:
+            item = self._novos[0]
+            if item in self.estados:
+                self._novos.popleft()  # reviewed since it was queued
+                continue
+            self._novos.rotate(-1)
+            if item != excluir or len(self._novos) == 1:
+                return item
+        if devido is not None:
+            return devido[1]  # nothing due: study ahead, soonest first
+        return excluir
+
+    def revisar(self, item, qualidade, agora=None):
+        """Record a review and return the item's new state"""
+        agora = agora or time.time()
+        estado = sm2(self.estados.get(item, [0, SRS_EASE_INICIAL, 0, agora]), qualidade, agora)
+        self.estados[item] = estado
+        heapq.heappush(self._heap, (estado[3], item))
+        return estado
+
+    def adiar(self, item, segundos=SRS_ADIAR_SEGUNDOS, agora=None):
+        """Push a due item that was left unanswered a little into the future"""
+        agora = agora or time.time()
+        estado = self.estados.get(item)
+        if estado is None or estado[3] > agora:
+            return
+        # New list: the old one may still be shared with progress["srs"]
+        self.estados[item] = [*estado[:3], agora + segundos]
+        heapq.heappush(self._heap, (agora + segundos, item))
+
+
+def obter_agendador(corpus, progress, nivel):
+    """Session scheduler for the current learner and level"""
+    chave = (progress.get("user_id"), nivel, id(corpus))
+    if st.session_state.get("agendador_chave") != chave:
+        st.session_state.agendador = ReviewScheduler.para_nivel(
+            corpus, progress, nivel, st.session_state.get("difficult_words", {}))
+        st.session_state.agendador_chave = chave
+    return st.session_state.agendador
+
+
+def escolher_proxima_frase(corpus, progress, nivel, atual=None):
+    agendador = obter_agendador(corpus, progress, nivel)
+    excluir = corpus.id_de(atual) if atual else None
+    if excluir is not None:
+        agendador.adiar(excluir)  # skipped while due: let the rest of the queue go first
+    item = agendador.proximo(excluir=excluir)
+    frase = corpus.buscar_resposta(item, nivel) if item else None
+    return frase or random.choice(corpus.frases(nivel))
+
+
+def registrar_revisao(corpus, progress, nivel, frase, status, sim):
+    """Grade the phrase on screen; only its first answer counts as a review"""
+    qualidade = qualidade_resposta(status, sim)
+    if qualidade is None or st.session_state.get("revisao_feita"):
+        return
+    st.session_state.revisao_feita = True  # cleared when another phrase is shown
+    item = corpus.id_de(frase)
+    estado = obter_agendador(corpus, progress, nivel).revisar(item, qualidade)
+    registrar_evento(progress, "revisao", item=item, estado=estado)
+
+
 # ============================================
 # UTILITY FUNCTIONS
 # ============================================
 
+AUDIO_CACHE_DIR = os.environ.get("AUDIO_CACHE_DIR", ".audio_cache")
+AUDIO_CACHE_MAX_BYTES = int(os.environ.get("AUDIO_CACHE_MAX_MB", "200")) * 1024 * 1024
+AUDIO_MEMORY_CACHE_SIZE = 256
+TTS_TIMEOUT = 10.0
+
+
+class AudioMemoria:
+    """In-process LRU of mp3 bytes plus the running size of the disk cache.
+
+    One instance per process (see get_audio_memoria): the script re-executes
+    on every rerun, so module globals would start empty each time and their
+    lock would not be shared between sessions.
+    """
+
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self.itens = OrderedDict()
+        self.lock = threading.Lock()
+        self.disco_bytes = None  # unknown until the first scan
+
+    def obter(self, key):
+        with self.lock:
+            data = self.itens.get(key)
+            if data is not None:
+                self.itens.move_to_end(key)
+            return data
+
+    def guardar(self, key, data):
+        with self.lock:
+            self.itens[key] = data
+            self.itens.move_to_end(key)
+            while len(self.itens) > self.capacidade:
+                self.itens.popitem(last=False)
+
+
+@st.cache_resource
+def get_audio_memoria():
+    return AudioMemoria(AUDIO_MEMORY_CACHE_SIZE)
+
+
+def audio_cache_key(texto, lang="en", tld="com", slow=False):
+    """Stable digest of a TTS request, used as the cache file name"""
+    payload = json.dumps([texto.strip(), lang, tld, bool(slow)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _audio_cache_path(key):
+    return os.path.join(AUDIO_CACHE_DIR, f"{key}.mp3")
+
+
+def _podar_cache_audio(memoria):
+    """Evict least recently used files until the disk cache fits its budget.
+
+    The budget covers the cache and the copies published under static/audio.
+    """
+    arquivos = []
+    for pasta in (AUDIO_CACHE_DIR, STATIC_AUDIO_DIR):
+        try:
+            for entrada in os.scandir(pasta):
+                if entrada.name.endswith(".mp3"):
+                    info = entrada.stat()
+                    arquivos.append((info.st_mtime, info.st_size, entrada.path))
+        except FileNotFoundError:
+            continue
+    arquivos.sort()
+    total = sum(size for _, size, _ in arquivos)
+    for _, size, path in arquivos:
+        if total <= AUDIO_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+    memoria.disco_bytes = total
+
+
+def _gravar_arquivo_atomico(path, data):
+    """Write via a temp file + rename so readers never see a partial file"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _gravar_cache_audio(path, data, memoria):
+    try:
+        _gravar_arquivo_atomico(path, data)
+    except OSError:
+        return
+    _contar_bytes_audio(len(data), memoria)
+
+
+def _contar_bytes_audio(tamanho, memoria):
+    """Account a newly written mp3 and prune once the budget is exceeded"""
+    with memoria.lock:
+        if memoria.disco_bytes is None:
+            precisa_podar = True
+        else:
+            memoria.disco_bytes += tamanho
+            precisa_podar = memoria.disco_bytes > AUDIO_CACHE_MAX_BYTES
+    if precisa_podar:
+        _podar_cache_audio(memoria)
+
+
+def sintetizar_audio(texto, lang="en", tld="com", slow=False, memoria=None):
+    """Return mp3 bytes for texto, trying memory, then disk, then gTTS.
+
+    Worker threads get memoria passed in from the script thread.
+    """
+    memoria = memoria or get_audio_memoria()
+    key = audio_cache_key(texto, lang, tld, slow)
+    data = memoria.obter(key)
+    if data is not None:
+        return data
+
+    path = _audio_cache_path(key)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)  # refresh the file's position in the disk LRU
+    except FileNotFoundError:
+        buf = io.BytesIO()
+        gTTS(text=texto, lang=lang, tld=tld, slow=slow, timeout=TTS_TIMEOUT).write_to_fp(buf)
+        data = buf.getvalue()
+        _gravar_cache_audio(path, data, memoria)
+
+    memoria.guardar(key, data)
+    return data
+
+
+def audio_em_cache(texto, lang="en", tld="com", slow=False):
+    return os.path.exists(_audio_cache_path(audio_cache_key(texto, lang, tld, slow)))
+
+
+def coletar_textos_audio(frases_por_nivel, vocab_por_topico):
+    """Every English string the UI can play, deduplicated in a stable order"""
+    textos = []
+    for frases in frases_por_nivel.values():
+        for frase in frases:
+            textos.append(frase.get("pergunta_en", ""))
+            textos.append(frase.get("resposta_en", ""))
+    for palavras in vocab_por_topico.values():
+        for palavra in palavras:
+            textos.append(palavra.get("en", ""))
+    return list(dict.fromkeys(t.strip() for t in textos if t and t.strip()))
+
+
+def preaquecer_audio(textos, lang="en", workers=8, on_progress=None):
+    """Synthesize every missing text into the audio cache with a bounded pool.
+
+    Entries already on disk are skipped, so re-runs only pay for new or
+    changed phrases. Returns a dict with counts, elapsed time and failures.
+    """
+    from concurrent.futures import as_completed
+
+    pendentes = [t for t in textos if not audio_em_cache(t, lang)]
+    relatorio = {"total": len(textos), "pulados": len(textos) - len(pendentes),
+                 "gerados": 0, "falhas": [], "segundos": 0.0}
+    inicio = time.perf_counter()
+    memoria = get_audio_memoria()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(sintetizar_audio, t, lang, memoria=memoria): t for t in pendentes}
+        for i, future in enumerate(as_completed(futures), 1):
+            texto = futures[future]
+            try:
+                future.result()
+                relatorio["gerados"] += 1
+            except Exception as e:
+                relatorio["falhas"].append((texto, str(e)))
+            if on_progress:
+                on_progress(i, len(pendentes), texto)
+    relatorio["segundos"] = time.perf_counter() - inicio
+    return relatorio
+
+
+# "media": st.audio handle served from Streamlit's media endpoint (default)
+# "static": file under static/audio, needs server.enableStaticServing
+# "inline": legacy base64 data URI embedded in the markdown
+AUDIO_MODE = os.environ.get("AUDIO_MODE", "media")
+STATIC_AUDIO_DIR = os.path.join("static", "audio")
+
+AUDIO_ERROR_HTML = '<div style="color:#f87171;padding:12px;border:1px solid rgba(239,68,68,0.4);border-radius:8px;">🔇 Erro ao gerar áudio: verifique sua conexão.</div>'
+
+
 def gerar_audio(texto, lang="en"):
     """Generate audio with error handling for network issues"""
     try:
-        tts = gTTS(text=texto, lang=lang)
-        filename = f"audio_{hash(texto)}.mp3"
-        tts.save(filename)
-        with open(filename, "rb") as f:
-            b64 = base64.b64encode(f.read()).decode()
-        os.remove(filename)
+        b64 = base64.b64encode(sintetizar_audio(texto, lang=lang)).decode()
         return f'<audio controls src="data:audio/mp3;base64,{b64}" style="width:100%;border-radius:8px;"></audio>'
     except Exception as e:
-        return f'<div style="color:#f87171;padding:12px;border:1px solid rgba(239,68,68,0.4);border-radius:8px;">🔇 Erro ao gerar áudio: verifique sua conexão.</div>'
+        return AUDIO_ERROR_HTML
+
+
+def _publicar_audio_estatico(texto, lang="en"):
+    """Copy the cached mp3 into the static folder once and return its URL"""
+    key = audio_cache_key(texto, lang)
+    path = os.path.join(STATIC_AUDIO_DIR, f"{key}.mp3")
+    if not os.path.exists(path):
+        memoria = get_audio_memoria()
+        data = sintetizar_audio(texto, lang=lang, memoria=memoria)
+        _gravar_arquivo_atomico(path, data)
+        _contar_bytes_audio(len(data), memoria)
+    return f"app/static/audio/{key}.mp3"
 
 
-def normalizar(txt: str) -> str:
-    txt = txt.strip().lower()
-    txt = "".join(c for c in unicodedata.normalize("NFKD", txt) if not unicodedata.combining(c))
-    txt = re.sub(r"[^a-z0-9']+", " ", txt)
-    return " ".join(txt.split())
+def _render_player(texto, lang="en"):
+    try:
+        if AUDIO_MODE == "inline":
+            st.markdown(gerar_audio(texto, lang), unsafe_allow_html=True)
+        elif AUDIO_MODE == "static":
+            url = _publicar_audio_estatico(texto, lang)
+            st.markdown(f'<audio controls src="{url}" style="width:100%;border-radius:8px;"></audio>',
+                        unsafe_allow_html=True)
+        else:
+            st.audio(sintetizar_audio(texto, lang=lang), format="audio/mp3")
+    except Exception:
+        st.markdown(AUDIO_ERROR_HTML, unsafe_allow_html=True)
+
+
+def tocar_audio(texto, lang="en", clicado=True):
+    """Render a player for texto, synthesizing in the background on a cache miss.
+
+    Call it on every run with clicado set to the button state: a miss waits in
+    a polling fragment that reruns the app once the mp3 is ready, and that
+    full run draws the plain player.
+    """
+    chave = f"tts:{audio_cache_key(texto, lang)}"
+    aguardando = st.session_state.setdefault("audio_aguardando", set())
+    if clicado and chave not in aguardando:
+        if audio_em_cache(texto, lang):
+            _render_player(texto, lang)
+            return
+        if not iniciar_tarefa(chave, "tts", sintetizar_audio, texto, lang=lang, memoria=get_audio_memoria()):
+            st.warning("🔇 Muitas solicitações de áudio no momento, tente novamente em instantes.")
+            return
+        aguardando.add(chave)
+    if chave not in aguardando:
+        return
+    if not tarefa_pronta(chave):
+        _aguardar_tarefa(chave, "🔄 Gerando áudio...")
+        return
+    aguardando.discard(chave)
+    consultar_tarefa(chave)  # drop the finished job; the mp3 is on disk now
+    if audio_em_cache(texto, lang):
+        _render_player(texto, lang)
+    else:
+        st.markdown(AUDIO_ERROR_HTML, unsafe_allow_html=True)
+
+
+_NAO_PALAVRA = re.compile(r"[^a-z0-9']+")
+# ASCII fast path: lowercase and blank out every non-word character in one pass
+_TABELA_ASCII = str.maketrans({chr(c): chr(c).lower() if chr(c).isalnum() or chr(c) == "'" else " "
+                               for c in range(128)})
+
+
+@st.cache_resource
+def _normalizador():
+    """Memoized normalizer shared by every rerun and session"""
+    @lru_cache(maxsize=4096)
+    def normalizar(txt: str) -> str:
+        if txt.isascii():
+            return " ".join(txt.translate(_TABELA_ASCII).split())
+        txt = txt.lower()
+        txt = "".join(c for c in unicodedata.normalize("NFKD", txt) if not unicodedata.combining(c))
+        return " ".join(_NAO_PALAVRA.sub(" ", txt).split())
+    return normalizar
+
+
+normalizar = _normalizador()
+
+
+def _razao(a_norm, b_norm):
+    """Similarity of two already-normalized strings (2 * matches / total length)"""
+    if Levenshtein is not None:
+        return Levenshtein.ratio(a_norm, b_norm)
+    return difflib.SequenceMatcher(None, a_norm, b_norm).ratio()
+
+
+def _opcodes(a_norm, b_norm):
+    if Indel is not None:
+        return Indel.opcodes(a_norm, b_norm)
+    return difflib.SequenceMatcher(None, a_norm, b_norm, autojunk=False).get_opcodes()
+
+
+def _spans(texto):
+    """(start, end) of every space-separated token"""
+    return [m.span() for m in re.finditer(r"\S+", texto)]
+
+
+@dataclass(frozen=True)
+class Alinhamento:
+    """Character alignment of an answer against a reference.
+
+    The ratio is read off the matched blocks (2 * matches / total length,
+    the same figure Levenshtein.ratio gives), and the word diff is projected
+    from those same blocks, so feedback never needs a second comparison.
+    """
+
+    usuario: str
+    referencia: str
+    opcodes: tuple
+    razao: float
+
+    @classmethod
+    def de(cls, user_norm, ref_norm):
+        ops = tuple(tuple(op) for op in _opcodes(user_norm, ref_norm))
+        total = len(user_norm) + len(ref_norm)
+        iguais = sum(i2 - i1 for tag, i1, i2, _, _ in ops if tag == "equal")
+        return cls(user_norm, ref_norm, ops, 2 * iguais / total if total else 1.0)
+
+    def diferencas(self):
+        """[(tipo, esperado, digitado)] with tipo in faltando / extra / trocada"""
+        par = [-1] * len(self.usuario)  # user char -> reference char
+        for tag, i1, i2, j1, _ in self.opcodes:
+            if tag == "equal":
+                par[i1:i2] = range(j1, j1 + i2 - i1)
+        tokens_u, tokens_r = _spans(self.usuario), _spans(self.referencia)
+        inicio_r = {a: k for k, (a, _) in enumerate(tokens_r)}
+
+        # A word is right when every character lines up with one whole reference word
+        ancoras = []
+        for k, (a, b) in enumerate(tokens_u):
+            alvo = inicio_r.get(par[a])
+            if alvo is not None and tokens_r[alvo][1] - tokens_r[alvo][0] == b - a \
+                    and par[b - 1] == par[a] + b - a - 1 and all(par[i] >= 0 for i in range(a, b)):
+                ancoras.append((k, alvo))
+        ancoras.append((len(tokens_u), len(tokens_r)))
+
+        palavra_u = [self.usuario[a:b] for a, b in tokens_u]
+        palavra_r = [self.referencia[a:b] for a, b in tokens_r]
+        diferencas = []
+        fim_u = fim_r = 0
+        for k, alvo in ancoras:
+            digitadas, esperadas = palavra_u[fim_u:k], palavra_r[fim_r:alvo]
+            for esperada, digitada in zip(esperadas, digitadas):
+                diferencas.append(("trocada", esperada, digitada))
+            diferencas.extend(("faltando", p, "") for p in esperadas[len(digitadas):])
+            diferencas.extend(("extra", "", p) for p in digitadas[len(esperadas):])
+            fim_u, fim_r = k + 1, alvo + 1
+        return diferencas
 
 
 def similaridade(a: str, b: str) -> float:
-    return difflib.SequenceMatcher(None, normalizar(a), normalizar(b)).ratio()
+    return _razao(normalizar(a), normalizar(b))
 
 
-def classificar_erro(user: str, correct: str) -> str:
-    sim = similaridade(user, correct)
+def _rotulo_erro(sim):
     if sim >= 0.9: return f"Quase perfeito ({sim*100:.0f}%)"
     if sim >= 0.75: return f"Pequeno erro ({sim*100:.0f}%)"
     if sim >= 0.6: return f"Erro moderado ({sim*100:.0f}%)"
     return f"Muito diferente ({sim*100:.0f}%)"
 
 
+def classificar_erro(user: str, correct: str) -> str:
+    return _rotulo_erro(similaridade(user, correct))
+
+
+@dataclass(frozen=True)
+class Avaliacao:
+    status: str
+    mensagem: str
+    pontos: int
+    similaridade: float
+    variante: str = ""
+    # (tipo, esperado, digitado) word differences, see Alinhamento.diferencas
+    diferencas: tuple = ()
+
+    def como_tupla(self):
+        return self.status, self.mensagem, self.pontos, self.similaridade
+
+
+def _avaliacao_de(user_norm, sim):
+    if not user_norm:
+        return Avaliacao("warn", "Digite algo ou use o microfone.", 0, 0.0)
+    if sim >= 1.0:
+        return Avaliacao("success", "Correto! Excelente trabalho!", 1, 1.0)
+    return Avaliacao("info" if sim >= 0.75 else "error", _rotulo_erro(sim), 0, sim)
+
+
+def _trigramas(texto_norm):
+    texto = f" {texto_norm} "
+    return frozenset(texto[i:i + 3] for i in range(len(texto) - 2))
+
+
+@dataclass(frozen=True)
+class RespostasAceitas:
+    """Every accepted answer of a phrase, normalized once at load time"""
+
+    originais: tuple
+    normalizadas: tuple
+    trigramas: tuple
+
+    # Above this many variants, only the best prefiltered ones are scored
+    CANDIDATOS = 6
+
+    @classmethod
+    def de_frase(cls, frase):
+        textos = [frase["resposta_en"]] + list(frase.get("respostas_aceitas", ()))
+        vistos = {}
+        for texto in textos:
+            vistos.setdefault(normalizar(texto), texto)
+        normalizadas = tuple(vistos)
+        return cls(tuple(vistos.values()), normalizadas, tuple(_trigramas(n) for n in normalizadas))
+
+    def melhor(self, user_norm):
+        """(index, Alinhamento) of the closest accepted answer"""
+        try:
+            indice = self.normalizadas.index(user_norm)
+            return indice, Alinhamento(user_norm, user_norm, (), 1.0)
+        except ValueError:
+            pass
+        indices = range(len(self.normalizadas))
+        if len(self.normalizadas) > self.CANDIDATOS:
+            # Rank by trigram overlap and keep the most promising few
+            tri = _trigramas(user_norm)
+            dice = [2 * len(tri & t) / (len(tri) + len(t)) for t in self.trigramas]
+            indices = sorted(indices, key=dice.__getitem__, reverse=True)[:self.CANDIDATOS]
+        melhor_i, melhor = 0, None
+        tam = len(user_norm)
+        for i in indices:
+            ref = self.normalizadas[i]
+            # Length alone caps the ratio; skip variants that cannot win
+            if melhor is not None and 2 * min(tam, len(ref)) / ((tam + len(ref)) or 1) <= melhor.razao:
+                continue
+            alinhamento = Alinhamento.de(user_norm, ref)
+            if melhor is None or alinhamento.razao > melhor.razao:
+                melhor_i, melhor = i, alinhamento
+        return melhor_i, melhor
+
+
+def avaliar_resposta(resposta_usuario, resposta_correta=None, referencias=None, semantico=None):
+    """Score one answer against the closest accepted reference.
+
+    The user's text is normalized once; references come pre-normalized in
+    a RespostasAceitas (built from resposta_correta when not given). With a
+    semantico index, near-misses are also credited for paraphrasing.
+    """
+    if referencias is None:
+        referencias = RespostasAceitas.de_frase({"resposta_en": resposta_correta})
+    user_norm = normalizar(resposta_usuario)
+    if not user_norm:
+        return _avaliacao_de(user_norm, 0.0)
+    indice, alinhamento = referencias.melhor(user_norm)
+    sim = alinhamento.razao
+    if semantico is not None and sim < 1.0:
+        sim = semantico.combinar(user_norm, referencias.normalizadas[0], sim)
+    avaliacao = _avaliacao_de(user_norm, sim)
+    diferencas = () if avaliacao.pontos else tuple(alinhamento.diferencas())
+    return Avaliacao(avaliacao.status, avaliacao.mensagem, avaliacao.pontos, avaliacao.similaridade,
+                     referencias.originais[indice], diferencas)
+
+
+def _pontuar_normalizados(usuarios, referencias, workers=-1):
+    if not usuarios:
+        return np.zeros(0)
+    if rf_process is not None:
+        return rf_process.cpdist(usuarios, referencias, scorer=Indel.normalized_similarity,
+                                 dtype=np.float64, workers=workers)
+    return np.fromiter((_razao(u, r) for u, r in zip(usuarios, referencias)),
+                       dtype=np.float64, count=len(usuarios))
+
+
+def pontuar_lote(pares, workers=-1):
+    """Similarity for many (user, reference) pairs at once, as a float array.
+
+    Uses rapidfuzz's multithreaded C kernel when available (same metric as
+    Levenshtein.ratio), otherwise loops over _razao.
+    """
+    return _pontuar_normalizados([normalizar(u) for u, _ in pares],
+                                 [normalizar(r) for _, r in pares], workers)
+
+
+def verificar_lote(pares, workers=-1):
+    """Avaliacao for every (user, reference) pair, e.g. to re-score history"""
+    usuarios = [normalizar(u) for u, _ in pares]
+    sims = _pontuar_normalizados(usuarios, [normalizar(r) for _, r in pares], workers)
+    return [_avaliacao_de(u, float(sim)) for u, sim in zip(usuarios, sims)]
+
+
 def verificar_texto(resposta_usuario: str, resposta_correta: str):
-    if not resposta_usuario.strip():
-        return ("warn", "Digite algo ou use o microfone.", 0, 0.0)
-    if normalizar(resposta_usuario) == normalizar(resposta_correta):
-        return ("success", "Correto! Excelente trabalho!", 1, 1.0)
-    sim = similaridade(resposta_usuario, resposta_correta)
-    if sim >= 0.75:
-        return ("info", classificar_erro(resposta_usuario, resposta_correta), 0, sim)
-    return ("error", classificar_erro(resposta_usuario, resposta_correta), 0, sim)
-
-
-def transcrever_wav_bytes(wav_bytes: bytes, language="en-US") -> str | None:
-    r = sr.Recognizer()
-    with NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-        tmp.write(wav_bytes)
-        tmp_path = tmp.name
+    return avaliar_resposta(resposta_usuario, resposta_correta).como_tupla()
+
+
+# ============================================
+# SEMANTIC SCORING (optional)
+# ============================================
+
+# "ratio" (edit distance only) or "semantico" (blend in TF-IDF cosine)
+SCORING_MODE = os.environ.get("SCORING_MODE", "ratio")
+SEMANTIC_WEIGHT = float(os.environ.get("SEMANTIC_WEIGHT", "0.4"))
+SEMANTIC_CACHE_DIR = os.environ.get("SEMANTIC_CACHE_DIR", ".semantic_cache")
+
+
+class IndiceSemantico:
+    """Char n-gram TF-IDF vectors of every accepted answer in the corpus.
+
+    Rows are L2-normalized and grouped per phrase id, so the cosine against
+    a phrase is one sparse matrix-vector product. The matrix (.npz) and the
+    vocabulary, idf weights and row ranges (.json) are cached under
+    SEMANTIC_CACHE_DIR, keyed by the answer texts, and only refitted when
+    the corpus changes. Neither file can execute code when loaded.
+    """
+
+    PARAMETROS = {"analyzer": "char_wb", "ngram_range": (2, 4), "sublinear_tf": True, "dtype": np.float32}
+
+    def __init__(self, vetorizador, matriz, faixas):
+        self.vetorizador = vetorizador
+        self.matriz = matriz
+        self.faixas = faixas  # id -> (first row, last row + 1)
+
+    @classmethod
+    def construir(cls, referencias):
+        textos, faixas = [], {}
+        for item, refs in referencias.items():
+            faixas[item] = (len(textos), len(textos) + len(refs.normalizadas))
+            textos.extend(refs.normalizadas)
+        vetorizador = TfidfVectorizer(**cls.PARAMETROS)
+        return cls(vetorizador, vetorizador.fit_transform(textos).tocsr(), faixas)
+
+    @classmethod
+    def _ler(cls, base):
+        with open(f"{base}.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        matriz = sparse.load_npz(f"{base}.npz").tocsr()
+        if not matriz.shape[1] == len(meta["vocabulario"]) == len(meta["idf"]):
+            raise ValueError("TF-IDF cache files do not match")
+        vetorizador = TfidfVectorizer(vocabulary=meta["vocabulario"], **cls.PARAMETROS)
+        vetorizador.idf_ = np.asarray(meta["idf"], dtype=np.float32)
+        return cls(vetorizador, matriz, {item: tuple(faixa) for item, faixa in meta["faixas"].items()})
+
+    def _gravar(self, base):
+        buffer = io.BytesIO()
+        sparse.save_npz(buffer, self.matriz)
+        _gravar_arquivo_atomico(f"{base}.npz", buffer.getvalue())
+        meta = {"vocabulario": {ngrama: int(i) for ngrama, i in self.vetorizador.vocabulary_.items()},
+                "idf": self.vetorizador.idf_.tolist(), "faixas": self.faixas}
+        _gravar_arquivo_atomico(f"{base}.json", json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+    @classmethod
+    def carregar(cls, referencias):
+        """Index for referencias, from the disk cache when it is current"""
+        if TfidfVectorizer is None:
+            logging.warning("SCORING_MODE=semantico needs scikit-learn; using the ratio only")
+            return None
+        chave = hashlib.sha1(json.dumps([sklearn.__version__, sorted(
+            (item, refs.normalizadas) for item, refs in referencias.items())]).encode("utf-8")).hexdigest()
+        base = os.path.join(SEMANTIC_CACHE_DIR, f"tfidf-{chave[:16]}")
+        try:
+            return cls._ler(base)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass  # missing, partial or stale: refit below
+        indice = cls.construir(referencias)
+        try:
+            indice._gravar(base)
+        except OSError as e:
+            logging.warning("could not cache TF-IDF index: %s", e)
+        return indice
+
+    def vetor(self, user_norm):
+        return self.vetorizador.transform([user_norm])
+
+    def cosseno(self, user_norm, item):
+        """Best cosine against the accepted answers of item, or None if unknown"""
+        faixa = self.faixas.get(item)
+        if faixa is None:
+            return None
+        return float((self.matriz[faixa[0]:faixa[1]] @ self.vetor(user_norm).T).max())
+
+    def combinar(self, user_norm, item, razao):
+        """Blend the edit ratio with the cosine; paraphrases can only gain"""
+        cosseno = self.cosseno(user_norm, item)
+        if cosseno is None:
+            return razao
+        # Capped below 1.0 so that only an exact answer counts as correct
+        return max(razao, min((1 - SEMANTIC_WEIGHT) * razao + SEMANTIC_WEIGHT * cosseno, 0.99))
+
+
+# ============================================
+# SPEECH RECOGNITION BACKENDS
+# ============================================
+
+STT_BACKEND = os.environ.get("STT_BACKEND", "google")
+STT_TIMEOUT = 20.0
+VOSK_MODEL_PATH = os.environ.get("VOSK_MODEL_PATH", "model")
+# What the recognizers actually consume; the recorder captures 44.1 kHz
+STT_SAMPLE_RATE = 16000
+
+# Energy-gate VAD applied before recognition
+VAD_FRAME_MS = 30
+VAD_MIN_DB = -50.0        # absolute floor in dBFS
+VAD_RELATIVE_DB = 35.0    # frames this far below the loudest one are silence
+VAD_PADDING_MS = 210
+VAD_MIN_SPEECH_MS = 240
+MAX_CLIP_SECONDS = 15.0
+
+
+class RecognizerBackend:
+    """Turns an sr.AudioData into text. One instance is shared per process."""
+
+    nome = "base"
+
+    def __init__(self):
+        self.latencias_ms = deque(maxlen=200)
+
+    def reconhecer(self, audio, language):
+        raise NotImplementedError
+
+    def transcrever(self, audio, language="en-US"):
+        """Recognize audio and record how long it took"""
+        inicio = time.perf_counter()
+        try:
+            return self.reconhecer(audio, language)
+        finally:
+            self.latencias_ms.append((time.perf_counter() - inicio) * 1000)
+
+    def latencia_p50_p95(self):
+        if not self.latencias_ms:
+            return None, None
+        ordenadas = sorted(self.latencias_ms)
+        return ordenadas[len(ordenadas) // 2], ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.95))]
+
+
+class GoogleBackend(RecognizerBackend):
+    """Google Web Speech API (network)"""
+
+    nome = "google"
+
+    def reconhecer(self, audio, language):
+        r = sr.Recognizer()
+        r.operation_timeout = STT_TIMEOUT
+        try:
+            return r.recognize_google(audio, language=language)
+        except (sr.UnknownValueError, sr.RequestError):
+            return None
+
+
+class VoskBackend(RecognizerBackend):
+    """Offline Kaldi models via vosk; the model is loaded once and shared"""
+
+    nome = "vosk"
+    SAMPLE_RATE = STT_SAMPLE_RATE
+
+    def __init__(self, model_path=VOSK_MODEL_PATH):
+        super().__init__()
+        try:
+            import vosk
+        except ImportError as e:
+            raise RuntimeError("STT_BACKEND=vosk requer 'pip install vosk'") from e
+        if not os.path.isdir(model_path):
+            raise RuntimeError(f"Modelo Vosk não encontrado em '{model_path}' (defina VOSK_MODEL_PATH)")
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self._model = vosk.Model(model_path)
+
+    def reconhecer(self, audio, language):
+        # The model decides the language; language is kept for API symmetry
+        rec = self._vosk.KaldiRecognizer(self._model, self.SAMPLE_RATE)
+        rec.AcceptWaveform(audio.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2))
+        texto = json.loads(rec.FinalResult()).get("text", "").strip()
+        return texto or None
+
+
+class FakeBackend(RecognizerBackend):
+    """Deterministic backend for tests and offline demos.
+
+    Returns queued answers in order, then falls back to STT_FAKE_TEXT.
+    Only the most recent calls are kept: the instance lives for the process.
+    """
+
+    nome = "fake"
+
+    def __init__(self, respostas=None):
+        super().__init__()
+        self.respostas = deque(respostas or [])
+        self.chamadas = deque(maxlen=50)
+
+    def reconhecer(self, audio, language):
+        self.chamadas.append((audio, language))
+        if self.respostas:
+            return self.respostas.popleft()
+        return os.environ.get("STT_FAKE_TEXT") or None
+
+
+STT_BACKENDS = {
+    "google": GoogleBackend,
+    "vosk": VoskBackend,
+    "fake": FakeBackend,
+}
+
+
+@st.cache_resource
+def get_stt_backend(nome=STT_BACKEND):
+    if nome not in STT_BACKENDS:
+        raise RuntimeError(f"STT_BACKEND desconhecido: '{nome}' (opções: {', '.join(STT_BACKENDS)})")
+    return STT_BACKENDS[nome]()
+
+
+def decodificar_wav(wav_bytes):
+    """Decode PCM WAV bytes into (mono float32 samples in [-1, 1], sample rate).
+
+    Works straight from memory; no temp file round trip.
+    """
+    with wave.open(io.BytesIO(wav_bytes), "rb") as w:
+        canais, largura, taxa = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        frames = w.readframes(w.getnframes())
+
+    if largura == 1:
+        amostras = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif largura == 2:
+        amostras = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    elif largura == 3:
+        bytes_ = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        inteiros = bytes_[:, 0] | (bytes_[:, 1] << 8) | (bytes_[:, 2] << 16)
+        inteiros = np.where(inteiros & 0x800000, inteiros - 0x1000000, inteiros)
+        amostras = inteiros.astype(np.float32) / 8388608.0
+    elif largura == 4:
+        amostras = np.frombuffer(frames, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise wave.Error(f"sample width {largura} não suportado")
+
+    if canais > 1:
+        amostras = amostras.reshape(-1, canais).mean(axis=1)
+    return amostras, taxa
+
+
+def reamostrar(amostras, taxa, nova_taxa=STT_SAMPLE_RATE):
+    """Linear resample, with a box low-pass first when downsampling"""
+    if taxa == nova_taxa or len(amostras) == 0:
+        return amostras
+    if taxa > nova_taxa:
+        janela = int(round(taxa / nova_taxa))
+        if janela > 1:
+            amostras = np.convolve(amostras, np.full(janela, 1.0 / janela, dtype=np.float32), mode="same")
+    n = max(1, int(round(len(amostras) * nova_taxa / taxa)))
+    posicoes = np.linspace(0, len(amostras) - 1, n)
+    return np.interp(posicoes, np.arange(len(amostras)), amostras).astype(np.float32)
+
+
+def para_audio_data(amostras, taxa=STT_SAMPLE_RATE):
+    pcm = (np.clip(amostras, -1.0, 1.0) * 32767).astype("<i2")
+    return sr.AudioData(pcm.tobytes(), taxa, 2)
+
+
+def aparar_silencio(amostras, taxa):
+    """Energy-gate VAD: drop leading/trailing silence and cap the clip length.
+
+    Returns (trimmed samples, seconds kept); the clip comes back empty when
+    it holds less than VAD_MIN_SPEECH_MS of speech.
+    """
+    quadro = max(1, int(taxa * VAD_FRAME_MS / 1000))
+    n_quadros = len(amostras) // quadro
+    if n_quadros == 0:
+        return amostras[:0], 0.0
+
+    quadros = amostras[:n_quadros * quadro].reshape(n_quadros, quadro)
+    db = 10 * np.log10(np.mean(quadros * quadros, axis=1) + 1e-12)
+    limiar = max(VAD_MIN_DB, db.max() - VAD_RELATIVE_DB)
+    voz = np.flatnonzero(db > limiar)
+    if len(voz) * VAD_FRAME_MS < VAD_MIN_SPEECH_MS:
+        return amostras[:0], 0.0
+
+    margem = VAD_PADDING_MS // VAD_FRAME_MS
+    inicio = max(0, voz[0] - margem) * quadro
+    fim = min(n_quadros, voz[-1] + 1 + margem) * quadro
+    trecho = amostras[inicio:fim][:int(MAX_CLIP_SECONDS * taxa)]
+    return trecho, len(trecho) / taxa
+
+
+def preparar_audio(wav_bytes):
+    """Decode, downsample and trim recorder bytes for the recognizers.
+
+    Returns (16 kHz mono 16-bit AudioData, speech seconds), or (None, 0.0)
+    when the clip is silent.
+    """
     try:
-        with sr.AudioFile(tmp_path) as source:
-            audio = r.record(source)
-        return r.recognize_google(audio, language=language)
-    except sr.UnknownValueError:
-        return None
-    except sr.RequestError:
-        return None
-    finally:
+        amostras, taxa = decodificar_wav(wav_bytes)
+        amostras = reamostrar(amostras, taxa)
+    except (wave.Error, EOFError):
+        # Not plain PCM WAV: let speech_recognition handle AIFF/FLAC/etc. in memory
+        with sr.AudioFile(io.BytesIO(wav_bytes)) as source:
+            audio = sr.Recognizer().record(source)
+        pcm = audio.get_raw_data(convert_rate=STT_SAMPLE_RATE, convert_width=2)
+        amostras = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+
+    trecho, duracao = aparar_silencio(amostras, STT_SAMPLE_RATE)
+    if duracao == 0.0:
+        return None, 0.0
+    return para_audio_data(trecho), duracao
+
+
+def transcrever_audio(audio, language="en-US", backend=None):
+    """Return (text or None, recognition time in ms)"""
+    backend = backend or get_stt_backend()
+    inicio = time.perf_counter()
+    texto = backend.transcrever(audio, language)
+    return texto, (time.perf_counter() - inicio) * 1000
+
+
+def transcrever_com_latencia(wav_bytes: bytes, language="en-US", backend=None):
+    audio, _ = preparar_audio(wav_bytes)
+    if audio is None:
+        return None, 0.0
+    return transcrever_audio(audio, language, backend)
+
+
+def transcrever_wav_bytes(wav_bytes: bytes, language="en-US", backend=None) -> str | None:
+    return transcrever_com_latencia(wav_bytes, language, backend)[0]
+
+
+# ============================================
+# BACKGROUND WORKERS
+# ============================================
+
+WORKER_THREADS = int(os.environ.get("WORKER_THREADS", "8"))
+# Max in-flight calls per backend, shared by every session in the process
+BACKEND_LIMITS = {"tts": 4, "stt": 2}
+# How long the UI waits for a job before giving up on it
+JOB_TIMEOUTS = {"tts": TTS_TIMEOUT + 5, "stt": STT_TIMEOUT + 5}
+POLL_INTERVAL = 0.5
+
+
+class BackgroundWorkers:
+    """Shared thread pool with per-backend concurrency limits"""
+
+    def __init__(self, max_workers, limits):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="trainer-worker")
+        self._limits = {backend: threading.BoundedSemaphore(n) for backend, n in limits.items()}
+
+    def submit(self, backend, fn, *args, **kwargs):
+        """Return a Future, or None when the backend is already saturated.
+
+        The slot is only released when the call really finishes, so a hung
+        request keeps counting against the limit instead of piling up threads.
+        """
+        slot = self._limits[backend]
+        if not slot.acquire(blocking=False):
+            return None
         try:
-            os.remove(tmp_path)
-        except OSError:
-            pass
+            future = self._pool.submit(fn, *args, **kwargs)
+        except RuntimeError:
+            slot.release()
+            raise
+        future.add_done_callback(lambda _: slot.release())
+        return future
+
+
+@st.cache_resource
+def get_workers():
+    return BackgroundWorkers(WORKER_THREADS, BACKEND_LIMITS)
+
+
+def iniciar_tarefa(chave, backend, fn, *args, **kwargs):
+    """Submit fn under chave unless that job is already running for this session"""
+    tarefas = st.session_state.setdefault("tarefas", {})
+    agora = time.monotonic()
+    for antiga in [c for c, t in tarefas.items()
+                   if c != chave and t["future"].done() and agora - t["inicio"] > JOB_TIMEOUTS[t["backend"]]]:
+        del tarefas[antiga]  # results nobody came back for
+    if chave in tarefas:
+        return True
+    future = get_workers().submit(backend, fn, *args, **kwargs)
+    if future is None:
+        return False
+    tarefas[chave] = {"future": future, "backend": backend, "inicio": time.monotonic()}
+    return True
+
+
+def tarefa_pronta(chave):
+    """True once the job finished, expired or no longer exists"""
+    tarefa = st.session_state.get("tarefas", {}).get(chave)
+    if tarefa is None or tarefa["future"].done():
+        return True
+    return time.monotonic() - tarefa["inicio"] > JOB_TIMEOUTS[tarefa["backend"]]
+
+
+def consultar_tarefa(chave):
+    """Return (estado, valor) with estado in pending/done/error/timeout/missing.
+
+    Finished jobs are removed from the session, so their result is
+    delivered exactly once.
+    """
+    tarefas = st.session_state.get("tarefas", {})
+    tarefa = tarefas.get(chave)
+    if tarefa is None:
+        return "missing", None
+    future = tarefa["future"]
+    if future.done():
+        del tarefas[chave]
+        try:
+            return "done", future.result()
+        except Exception as e:
+            return "error", e
+    if time.monotonic() - tarefa["inicio"] > JOB_TIMEOUTS[tarefa["backend"]]:
+        future.cancel()
+        del tarefas[chave]
+        return "timeout", None
+    return "pending", None
+
+
+def cancelar_tarefas(prefixo=""):
+    tarefas = st.session_state.get("tarefas", {})
+    for chave in [c for c in tarefas if c.startswith(prefixo)]:
+        tarefas.pop(chave)["future"].cancel()
+
+
+@st.fragment(run_every=POLL_INTERVAL)
+def _aguardar_tarefa(chave, mensagem):
+    """Poll a job and rerun the whole app once its result can be consumed"""
+    if tarefa_pronta(chave):
+        st.rerun()
+    st.caption(mensagem)
 
 
 # ============================================
@@ -607,86 +2335,108 @@ def render_header():
     """, unsafe_allow_html=True)
 
 
-def render_stats_bar(progress, session_state):
-    """Render premium stats bar with XP, level, streak"""
-    level, next_level, xp_current, xp_next, xp_progress = get_level_info(progress["xp"])
-    level_info = LEVELS[level]
-    next_info = LEVELS.get(next_level, level_info)
+def render_user_selector():
+    """Sidebar field identifying the learner; ?user=<name> pre-fills it"""
+    if "user_id" not in st.session_state:
+        st.session_state.user_id = st.query_params.get("user", DEFAULT_USER)
+    with st.sidebar:
+        st.markdown("<div class='premium-heading'>👤 Aluno</div>", unsafe_allow_html=True)
+        nome = st.text_input("Usuário", key="user_id", help="Cada usuário tem seu próprio progresso")
+    return normalizar_usuario(nome)
 
-    col1, col2, col3, col4 = st.columns([1.5, 2, 1, 1])
 
-    with col1:
-        st.markdown(f"""
+# Builders for the header chrome HTML. They are plain f-strings on purpose:
+# formatting one costs a few microseconds, far less than a cache lookup.
+
+def _html_nivel(level, nome, icone):
+    return f"""
         <div class="xp-container">
-            <div class="level-badge">{level_info['icon']}</div>
+            <div class="level-badge">{icone}</div>
             <div class="xp-info">
-                <div style="font-weight:700;color:#f8fafc;">{level_info['name']}</div>
+                <div style="font-weight:700;color:#f8fafc;">{nome}</div>
                 <div class="xp-text">Nível {level}</div>
             </div>
         </div>
-        """, unsafe_allow_html=True)
+        """
 
-    with col2:
-        st.markdown(f"""
+
+def _html_barra_xp(xp, xp_next, next_name, xp_progress):
+    return f"""
         <div style="margin-top:8px;">
             <div style="display:flex;justify-content:space-between;margin-bottom:6px;">
-                <span style="font-size:0.875rem;color:#94a3b8;">XP: {progress['xp']}</span>
-                <span style="font-size:0.875rem;color:#64748b;">{xp_next - progress['xp']} para {next_info['name']}</span>
+                <span style="font-size:0.875rem;color:#94a3b8;">XP: {xp}</span>
+                <span style="font-size:0.875rem;color:#64748b;">{xp_next - xp} para {next_name}</span>
             </div>
             <div class="progress-container">
                 <div class="progress-fill" style="width:{xp_progress*100}%"></div>
             </div>
         </div>
-        """, unsafe_allow_html=True)
+        """
 
-    with col3:
-        streak = session_state.get("streak", 0)
-        flame = "🔥" if streak > 0 else "⚪"
-        st.markdown(f"""
+
+def _html_stat(icone, valor, rotulo, classe_icone=""):
+    icone_html = (f'<div class="{classe_icone}">{icone}</div>' if classe_icone
+                  else f'<div style="font-size:1.5rem;">{icone}</div>')
+    return f"""
         <div class="stat-card">
-            <div class="streak-flame">{flame}</div>
-            <div class="stat-value" style="font-size:1.5rem;">{streak}</div>
-            <div class="stat-label">Streak</div>
+            {icone_html}
+            <div class="stat-value" style="font-size:1.5rem;">{valor}</div>
+            <div class="stat-label">{rotulo}</div>
         </div>
-        """, unsafe_allow_html=True)
+        """
+
+
+def render_stats_bar(progress, session_state):
+    """Render premium stats bar with XP, level, streak"""
+    tabela = carregar_niveis()
+    level, next_level, _, xp_next, xp_progress = tabela.info(progress["xp"])
+    level_info, next_info = tabela.niveis[level], tabela.niveis[next_level]
+    streak = session_state.get("streak", 0)
 
+    col1, col2, col3, col4 = st.columns([1.5, 2, 1, 1])
+    with col1:
+        st.markdown(_html_nivel(level, level_info["name"], level_info["icon"]), unsafe_allow_html=True)
+    with col2:
+        st.markdown(_html_barra_xp(progress["xp"], xp_next, next_info["name"], xp_progress),
+                    unsafe_allow_html=True)
+    with col3:
+        st.markdown(_html_stat("🔥" if streak > 0 else "⚪", streak, "Streak", "streak-flame"),
+                    unsafe_allow_html=True)
     with col4:
-        score = session_state.get("score", 0)
-        st.markdown(f"""
-        <div class="stat-card">
-            <div style="font-size:1.5rem;">⭐</div>
-            <div class="stat-value" style="font-size:1.5rem;">{score}</div>
-            <div class="stat-label">Score</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(_html_stat("⭐", session_state.get("score", 0), "Score"), unsafe_allow_html=True)
 
 
-def render_difficulty_selector(current_level):
-    """Render premium difficulty selector using selectbox for reliability"""
-    st.markdown("<div class='premium-heading'>🎯 Nível de Dificuldade</div>", unsafe_allow_html=True)
-    
-    difficulties = ["Fácil", "Médio", "Difícil"]
-    
-    col1, col2, col3 = st.columns(3)
-    diff_cols = [col1, col2, col3]
-    diff_icons = {"Fácil": "🌱", "Médio": "📋", "Difícil": "💼"}
-    diff_desc = {"Fácil": "Iniciante", "Médio": "Intermediário", "Difícil": "Avançado"}
-    
-    # Display difficulty cards
-    for i, diff in enumerate(difficulties):
-        with diff_cols[i]:
-            is_active = current_level == diff
-            border_color = "rgba(99, 102, 241, 0.6)" if is_active else "rgba(99, 102, 241, 0.2)"
-            bg_color = "rgba(99, 102, 241, 0.15)" if is_active else "rgba(30, 41, 59, 0.5)"
-            st.markdown(f"""
+DIFFICULTIES = ("Fácil", "Médio", "Difícil")
+DIFF_ICONS = {"Fácil": "🌱", "Médio": "📋", "Difícil": "💼"}
+DIFF_DESC = {"Fácil": "Iniciante", "Médio": "Intermediário", "Difícil": "Avançado"}
+
+
+def _html_cartoes_dificuldade(current_level):
+    cartoes = []
+    for diff in DIFFICULTIES:
+        is_active = current_level == diff
+        border_color = "rgba(99, 102, 241, 0.6)" if is_active else "rgba(99, 102, 241, 0.2)"
+        bg_color = "rgba(99, 102, 241, 0.15)" if is_active else "rgba(30, 41, 59, 0.5)"
+        cartoes.append(f"""
             <div style="background:{bg_color};border:1px solid {border_color};border-radius:12px;
                         padding:16px;text-align:center;transition:all 0.3s ease;">
-                <div style="font-size:2rem;margin-bottom:8px;">{diff_icons[diff]}</div>
+                <div style="font-size:2rem;margin-bottom:8px;">{DIFF_ICONS[diff]}</div>
                 <div style="font-weight:700;color:#f8fafc;">{diff}</div>
-                <div style="font-size:0.875rem;color:#94a3b8;">{diff_desc[diff]}</div>
+                <div style="font-size:0.875rem;color:#94a3b8;">{DIFF_DESC[diff]}</div>
             </div>
-            """, unsafe_allow_html=True)
-    
+            """)
+    return tuple(cartoes)
+
+
+def render_difficulty_selector(current_level):
+    """Render premium difficulty selector using selectbox for reliability"""
+    st.markdown("<div class='premium-heading'>🎯 Nível de Dificuldade</div>", unsafe_allow_html=True)
+
+    difficulties = list(DIFFICULTIES)
+    for col, html in zip(st.columns(3), _html_cartoes_dificuldade(current_level)):
+        with col:
+            st.markdown(html, unsafe_allow_html=True)
+
     nivel = st.radio("", difficulties, 
                      index=difficulties.index(current_level),
                      label_visibility="collapsed", key="difficulty_radio",
@@ -747,14 +2497,16 @@ def render_phrase_card(frase, nivel):
         </div>
         """, unsafe_allow_html=True)
 
-        if st.button("🔊 Ouvir Resposta", key="audio_resposta", use_container_width=True):
-            audio_html = gerar_audio(resposta_en)
-            st.markdown(audio_html, unsafe_allow_html=True)
+        alternativas = frase.get("respostas_aceitas")
+        if alternativas:
+            st.caption("Também aceito: " + " · ".join(alternativas))
+
+        tocar_audio(resposta_en, clicado=st.button("🔊 Ouvir Resposta", key="audio_resposta",
+                                                    use_container_width=True))
 
     # Listen to question button
-    if st.button("🔊 Ouvir Pergunta", key="audio_pergunta", use_container_width=True):
-        audio_html = gerar_audio(pergunta_en)
-        st.markdown(audio_html, unsafe_allow_html=True)
+    tocar_audio(pergunta_en, clicado=st.button("🔊 Ouvir Pergunta", key="audio_pergunta",
+                                                use_container_width=True))
 
     return pergunta_en, resposta_en, resposta_pt
 
@@ -780,7 +2532,36 @@ def render_text_input_section(resposta_en):
     return resposta_usuario, verify_clicked, skip_clicked
 
 
-def render_feedback(status, msg, sim):
+DIFF_ESTILOS = {
+    "faltando": ("rgba(239,68,68,0.15)", "#f87171", "faltou"),
+    "extra": ("rgba(148,163,184,0.15)", "#94a3b8", "sobrou"),
+    "trocada": ("rgba(245,158,11,0.15)", "#fbbf24", "trocou"),
+}
+
+
+def render_diff(diferencas):
+    """Render word-level differences as chips under the feedback"""
+    if not diferencas:
+        return
+    chips = []
+    for tipo, esperada, digitada in diferencas:
+        fundo, cor, rotulo = DIFF_ESTILOS[tipo]
+        if tipo == "trocada":
+            texto = f"<s>{digitada}</s> → <b>{esperada}</b>"
+        elif tipo == "faltando":
+            texto = f"<b>{esperada}</b>"
+        else:
+            texto = f"<s>{digitada}</s>"
+        chips.append(f'<span style="background:{fundo};color:{cor};border-radius:8px;padding:4px 10px;'
+                     f'font-size:0.9rem;">{rotulo}: {texto}</span>')
+    st.markdown(f"""
+    <div class="premium-card animate-fade-in" style="display:flex;flex-wrap:wrap;gap:8px;padding:16px;">
+        {"".join(chips)}
+    </div>
+    """, unsafe_allow_html=True)
+
+
+def render_feedback(status, msg, sim, diferencas=()):
     """Render premium feedback messages"""
     if status == "success":
         st.markdown(f"""
@@ -820,52 +2601,131 @@ def render_feedback(status, msg, sim):
         """, unsafe_allow_html=True)
     elif status == "warn":
         st.warning(msg)
+    render_diff(diferencas)
 
 
-def render_audio_section(resposta_en):
-    """Render premium audio recording section"""
-    st.markdown("<div class='premium-divider'></div>", unsafe_allow_html=True)
-    st.markdown("<div class='premium-heading'>🎙️ Responder por Áudio</div>", unsafe_allow_html=True)
-
-    st.markdown("""
-    <div class="premium-card" style="text-align:center;">
-        <div style="font-size:3rem;margin-bottom:12px;">🎤</div>
-        <div style="color:#94a3b8;margin-bottom:16px;">Clique no microfone para gravar sua resposta</div>
+STT_ERROR_HTML = """
+<div class="feedback-error">
+    <div style="display:flex;align-items:center;gap:12px;">
+        <span style="font-size:1.5rem;">🔇</span>
+        <div>
+            <div style="font-weight:700;">Não entendi o áudio</div>
+            <div style="font-size:0.875rem;opacity:0.8;">Tente falar mais claramente ou em um ambiente mais silencioso</div>
+        </div>
     </div>
-    """, unsafe_allow_html=True)
+</div>
+"""
+
 
+@st.fragment
+def _gravador_audio():
+    """Recorder, VAD check and job submission; reruns alone while polling"""
     audio_bytes = audio_recorder(sample_rate=44100, text="🎤 Gravar / Parar")
 
+    enviado = False
     if audio_bytes:
         if st.button("🗣️ Transcrever e Verificar", key="verificar_audio", use_container_width=True):
-            with st.spinner("🔄 Processando áudio..."):
-                transcrito = transcrever_wav_bytes(audio_bytes)
-
-            if not transcrito:
+            chave = f"stt:{hashlib.sha256(audio_bytes).hexdigest()}"
+            try:
+                backend = get_stt_backend()
+            except RuntimeError as e:
+                st.error(f"🔇 {e}")
+                return
+            try:
+                audio, duracao = preparar_audio(audio_bytes)
+            except (ValueError, EOFError, wave.Error):
+                # Truncated or unsupported recording: nothing the recognizer can use
+                st.markdown(STT_ERROR_HTML, unsafe_allow_html=True)
+                return
+            if audio is None:
                 st.markdown("""
                 <div class="feedback-error">
                     <div style="display:flex;align-items:center;gap:12px;">
-                        <span style="font-size:1.5rem;">🔇</span>
+                        <span style="font-size:1.5rem;">🤫</span>
                         <div>
-                            <div style="font-weight:700;">Não entendi o áudio</div>
-                            <div style="font-size:0.875rem;opacity:0.8;">Tente falar mais claramente ou em um ambiente mais silencioso</div>
+                            <div style="font-weight:700;">Nenhuma fala detectada</div>
+                            <div style="font-size:0.875rem;opacity:0.8;">Grave novamente falando mais perto do microfone</div>
                         </div>
                     </div>
                 </div>
                 """, unsafe_allow_html=True)
+                return
+            if iniciar_tarefa(chave, "stt", transcrever_audio, audio, backend=backend):
+                st.session_state.stt_chave = chave
+                st.session_state.stt_backend = backend.nome
+                st.session_state.stt_duracao = duracao
+                enviado = True
             else:
-                st.markdown(f"""
-                <div class="premium-card" style="border-color:rgba(99,102,241,0.3);">
-                    <div style="color:#94a3b8;font-size:0.875rem;margin-bottom:8px;">Você disse:</div>
-                    <div style="font-size:1.1rem;color:#f8fafc;font-weight:500;">{transcrito}</div>
+                st.warning("🔄 Reconhecimento de voz ocupado, tente novamente em instantes.")
+
+    # Only peek here: render_audio_section consumes the result on the full run
+    chave = st.session_state.get("stt_chave")
+    if chave and not tarefa_pronta(chave):
+        _aguardar_tarefa(chave, "🔄 Processando áudio...")
+    elif enviado:
+        st.rerun()  # finished already; the full run scores it
+
+
+def render_audio_section(resposta_en):
+    """Render premium audio recording section"""
+    st.markdown("<div class='premium-divider'></div>", unsafe_allow_html=True)
+    st.markdown("<div class='premium-heading'>🎙️ Responder por Áudio</div>", unsafe_allow_html=True)
+
+    st.markdown("""
+    <div class="premium-card" style="text-align:center;">
+        <div style="font-size:3rem;margin-bottom:12px;">🎤</div>
+        <div style="color:#94a3b8;margin-bottom:16px;">Clique no microfone para gravar sua resposta</div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    _gravador_audio()
+
+    chave = st.session_state.get("stt_chave")
+    if not chave:
+        return None, 0.0
+
+    estado, resultado = consultar_tarefa(chave)
+    if estado == "pending":
+        return None, 0.0  # the recorder fragment polls and reruns the app when done
+    st.session_state.stt_chave = None
+    transcrito, latencia_ms = resultado if estado == "done" else (None, 0.0)
+
+    if estado == "timeout":
+        st.markdown("""
+        <div class="feedback-error">
+            <div style="display:flex;align-items:center;gap:12px;">
+                <span style="font-size:1.5rem;">⏱️</span>
+                <div>
+                    <div style="font-weight:700;">O reconhecimento demorou demais</div>
+                    <div style="font-size:0.875rem;opacity:0.8;">Verifique sua conexão e tente novamente</div>
                 </div>
-                """, unsafe_allow_html=True)
-                return transcrito
-    return None
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+    elif estado != "done" or not transcrito:
+        st.markdown(STT_ERROR_HTML, unsafe_allow_html=True)
+    else:
+        st.markdown(f"""
+        <div class="premium-card" style="border-color:rgba(99,102,241,0.3);">
+            <div style="color:#94a3b8;font-size:0.875rem;margin-bottom:8px;">Você disse:</div>
+            <div style="font-size:1.1rem;color:#f8fafc;font-weight:500;">{transcrito}</div>
+        </div>
+        """, unsafe_allow_html=True)
+        backend = get_stt_backend(st.session_state.get("stt_backend", STT_BACKEND))
+        _, p95 = backend.latencia_p50_p95()
+        st.caption(f"⏱️ {st.session_state.get('stt_duracao', 0.0):.1f}s de fala reconhecidos em {latencia_ms:.0f} ms "
+                   f"via {backend.nome} (p95: {p95 or latencia_ms:.0f} ms)")
+        return transcrito, st.session_state.get("stt_duracao", 0.0)
+    return None, 0.0
 
 
+def _mover_vocab(passo, total):
+    st.session_state.voc_index = max(0, min(total - 1, st.session_state.voc_index + passo))
+
+
+@st.fragment
 def render_vocabulary_section(vocab_data, progress):
-    """Render premium vocabulary section"""
+    """Render premium vocabulary section (navigation reruns only this fragment)"""
     st.markdown("<div class='premium-divider'></div>", unsafe_allow_html=True)
     st.markdown("<div class='premium-heading'>📖 Vocabulário por Tópicos</div>", unsafe_allow_html=True)
 
@@ -883,11 +2743,13 @@ def render_vocabulary_section(vocab_data, progress):
     index = st.session_state.voc_index
     palavra_atual = palavras[index]
 
-    # Track seen vocabulary (use list for JSON compatibility)
-    vocab_seen = progress.get("vocab_seen", [])
-    if palavra_atual["en"] not in vocab_seen:
-        vocab_seen.append(palavra_atual["en"])
-        progress["vocab_seen"] = vocab_seen
+    # Track seen vocabulary (vocab_seen is a set of word positions)
+    posicao = vocab_id(palavra_atual["en"])
+    if posicao not in progress["vocab_seen"]:
+        registrar_evento(progress, "vocab", en=palavra_atual["en"], posicao=posicao)
+        novas = disparar_conquistas(progress, st.session_state, "vocab_seen")
+        if novas:
+            render_new_achievements(novas)
 
     # Vocabulary card
     st.markdown(f"""
@@ -904,17 +2766,33 @@ def render_vocabulary_section(vocab_data, progress):
     # Audio and navigation
     col1, col2, col3 = st.columns([1, 1, 1])
     with col1:
-        if st.button("🔊 Ouvir", key="audio_palavra", use_container_width=True):
-            audio_html = gerar_audio(palavra_atual['en'])
-            st.markdown(audio_html, unsafe_allow_html=True)
+        tocar_audio(palavra_atual['en'],
+                    clicado=st.button("🔊 Ouvir", key="audio_palavra", use_container_width=True))
     with col2:
-        if st.button("⬅ Anterior", key="voc_ant", use_container_width=True):
-            st.session_state.voc_index = max(0, st.session_state.voc_index - 1)
-            st.rerun()
+        st.button("⬅ Anterior", key="voc_ant", use_container_width=True,
+                  on_click=_mover_vocab, args=(-1, len(palavras)))
     with col3:
-        if st.button("➡ Próxima", key="voc_prox", use_container_width=True):
-            st.session_state.voc_index = min(len(palavras) - 1, st.session_state.voc_index + 1)
-            st.rerun()
+        st.button("➡ Próxima", key="voc_prox", use_container_width=True,
+                  on_click=_mover_vocab, args=(1, len(palavras)))
+
+
+def _html_conquistas(ids):
+    """All unlocked achievements as one grid element"""
+    cartoes = []
+    for ach_id in ids:
+        ach = ACHIEVEMENTS.get(ach_id, {})
+        cartoes.append(f"""
+            <div style="background:rgba(30,41,59,0.5);border:1px solid rgba(245,158,11,0.3);
+                        border-radius:12px;padding:16px;text-align:center;">
+                <div style="font-size:2rem;margin-bottom:8px;">{ach.get('icon', '🏅')}</div>
+                <div style="font-weight:700;color:#fbbf24;font-size:0.95rem;">{ach.get('name', 'Unknown')}</div>
+                <div style="font-size:0.8rem;color:#94a3b8;">{ach.get('desc', '')}</div>
+            </div>""")
+    return f"""
+    <div style="display:grid;grid-template-columns:repeat(3,minmax(0,1fr));gap:12px;margin-bottom:12px;">
+        {"".join(cartoes)}
+    </div>
+    """
 
 
 def render_achievements(progress):
@@ -924,27 +2802,16 @@ def render_achievements(progress):
 
     st.markdown("<div class='premium-divider'></div>", unsafe_allow_html=True)
     st.markdown("<div class='premium-heading'>🏆 Conquistas</div>", unsafe_allow_html=True)
-
-    cols = st.columns(3)
-    for i, ach_id in enumerate(progress["achievements"]):
-        ach = ACHIEVEMENTS.get(ach_id, {})
-        with cols[i % 3]:
-            st.markdown(f"""
-            <div style="background:rgba(30,41,59,0.5);border:1px solid rgba(245,158,11,0.3);
-                        border-radius:12px;padding:16px;text-align:center;margin-bottom:12px;">
-                <div style="font-size:2rem;margin-bottom:8px;">{ach.get('icon', '🏅')}</div>
-                <div style="font-weight:700;color:#fbbf24;font-size:0.95rem;">{ach.get('name', 'Unknown')}</div>
-                <div style="font-size:0.8rem;color:#94a3b8;">{ach.get('desc', '')}</div>
-            </div>
-            """, unsafe_allow_html=True)
+    st.markdown(_html_conquistas(tuple(progress["achievements"])), unsafe_allow_html=True)
 
 
-def render_history(history_data):
-    """Render premium history table"""
+@st.fragment
+def render_history(historico):
+    """Render premium history table, one page at a time (paging reruns only the table)"""
     st.markdown("<div class='premium-divider'></div>", unsafe_allow_html=True)
     st.markdown("<div class='premium-heading'>📊 Histórico</div>", unsafe_allow_html=True)
 
-    if not history_data:
+    if not len(historico):
         st.markdown("""
         <div class="premium-card" style="text-align:center;padding:40px;">
             <div style="font-size:3rem;margin-bottom:12px;">📋</div>
@@ -953,27 +2820,34 @@ def render_history(history_data):
         """, unsafe_allow_html=True)
         return
 
+    pagina = 0
+    if historico.paginas() > 1:
+        pagina = st.number_input(f"Página (1 = mais recentes, de {historico.paginas()})", min_value=1,
+                                 max_value=historico.paginas(), value=1, key="history_page") - 1
+    if historico.total > len(historico):
+        st.caption(f"Mostrando as últimas {len(historico)} de {historico.total} respostas.")
+
+    df = historico.pagina(pagina)
     try:
-        df = pd.DataFrame(history_data)
         st.dataframe(df, use_container_width=True, hide_index=True,
                     column_config={
                         "nivel": st.column_config.TextColumn("Nível", width="small"),
                         "pergunta": st.column_config.TextColumn("Pergunta", width="large"),
                         "resposta_usuario": st.column_config.TextColumn("Sua Resposta", width="large"),
                         "resultado": st.column_config.TextColumn("Resultado", width="small"),
+                        "variante": st.column_config.TextColumn("Resposta Comparada", width="large"),
                         "similaridade": st.column_config.ProgressColumn("Similaridade", 
                                                                        min_value=0, max_value=1, 
-                                                                       format="%.0f%%", width="medium")
+                                                                       format="%.0f%%", width="medium"),
+                        "duracao_audio": st.column_config.NumberColumn("Áudio (s)", format="%.1f", width="small")
                     })
     except Exception:
-        st.write(history_data)
+        st.write(df)
 
 
-def render_new_achievements(new_achs):
-    """Render new achievement notifications"""
-    for ach_id in new_achs:
-        ach = ACHIEVEMENTS.get(ach_id, {})
-        st.markdown(f"""
+def _html_nova_conquista(ach_id):
+    ach = ACHIEVEMENTS.get(ach_id, {})
+    return f"""
         <div style="background:linear-gradient(135deg,rgba(245,158,11,0.2),rgba(251,191,36,0.2));
                     border:2px solid rgba(245,158,11,0.5);border-radius:16px;padding:20px;
                     margin-bottom:16px;animation:fadeInUp 0.6s ease;">
@@ -988,13 +2862,31 @@ def render_new_achievements(new_achs):
                 </div>
             </div>
         </div>
-        """, unsafe_allow_html=True)
+        """
+
+
+def render_new_achievements(new_achs):
+    """Render new achievement notifications"""
+    for ach_id in new_achs:
+        st.markdown(_html_nova_conquista(ach_id), unsafe_allow_html=True)
 
 
 # ============================================
 # MAIN APPLICATION
 # ============================================
 
+def avancar_frase(corpus, progress, nivel):
+    """Leave the current phrase (answered or skipped) for the next one"""
+    # A pending transcription belongs to the phrase being left behind
+    cancelar_tarefas("stt:")
+    st.session_state.stt_chave = None
+    st.session_state.frase_atual = escolher_proxima_frase(corpus, progress, nivel,
+                                                          atual=st.session_state.frase_atual)
+    st.session_state.resposta_usuario = ""
+    st.session_state.revisao_feita = False
+    st.rerun()
+
+
 def main():
     # Page configuration
     st.set_page_config(
@@ -1007,17 +2899,19 @@ def main():
     # Inject custom CSS
     inject_custom_css()
 
+    corpus = carregar_corpus()
+
     # Initialize session state
     if "nivel" not in st.session_state: 
         st.session_state.nivel = "Fácil"
     if "frase_atual" not in st.session_state: 
-        st.session_state.frase_atual = random.choice(SAMPLE_FRASES["Fácil"])
+        st.session_state.frase_atual = random.choice(corpus.frases("Fácil"))
     if "score" not in st.session_state: 
         st.session_state.score = 0
     if "streak" not in st.session_state: 
         st.session_state.streak = 0
     if "history" not in st.session_state: 
-        st.session_state.history = []
+        st.session_state.history = HistoricoSessao()
     if "difficult_words" not in st.session_state: 
         st.session_state.difficult_words = {}
     if "voc_index" not in st.session_state: 
@@ -1027,8 +2921,21 @@ def main():
     if "new_achievements" not in st.session_state:
         st.session_state.new_achievements = []
 
-    # Load progress
-    progress = load_user_progress()
+    # Load progress for the selected learner
+    user_id = render_user_selector()
+    # Progress lives in the session; reruns only re-read it when the learner changes
+    if st.session_state.get("usuario_carregado") != user_id:
+        if st.session_state.get("usuario_carregado"):
+            get_progress_writer().flush(st.session_state.usuario_carregado)
+        store = get_progress_store()
+        st.session_state.progress = load_user_progress(user_id)
+        st.session_state.history = HistoricoSessao(linhas=store.recent_history(user_id))
+        st.session_state.difficult_words = store.difficult_words(user_id)
+        st.session_state.usuario_carregado = user_id
+        if "guarda_sessao" not in st.session_state:
+            st.session_state.guarda_sessao = GuardaSessao(get_progress_writer())
+        st.session_state.guarda_sessao.usuarios.add(user_id)
+    progress = st.session_state.progress
 
     # Render header
     render_header()
@@ -1042,9 +2949,14 @@ def main():
     nivel = render_difficulty_selector(st.session_state.nivel)
     if nivel != st.session_state.nivel:
         st.session_state.nivel = nivel
-        st.session_state.frase_atual = random.choice(SAMPLE_FRASES[nivel])
+        st.session_state.frase_atual = escolher_proxima_frase(corpus, progress, nivel)
+        st.session_state.revisao_feita = False
         st.rerun()
 
+    # Seed the scheduler from progress as it was before this run's answer,
+    # or the answer itself would count as a past success
+    obter_agendador(corpus, progress, nivel)
+
     # Render new achievements if any
     if st.session_state.new_achievements:
         render_new_achievements(st.session_state.new_achievements)
@@ -1056,77 +2968,87 @@ def main():
 
     # Text input section
     resposta_usuario, verify_clicked, skip_clicked = render_text_input_section(resposta_en)
+    if skip_clicked:
+        avancar_frase(corpus, progress, nivel)
 
     if verify_clicked:
-        status, msg, inc, sim = verificar_texto(resposta_usuario, resposta_en)
+        avaliacao = avaliar_resposta(resposta_usuario, referencias=corpus.referencias(frase),
+                                     semantico=corpus.semantico)
+        status, msg, inc, sim = avaliacao.como_tupla()
+        palavras_erradas = [esperada for _, esperada, _ in avaliacao.diferencas if esperada]
+        if palavras_erradas:
+            registrar_palavras_dificeis(progress, palavras_erradas)
 
         # Update score and streak
         st.session_state.score += inc
         if inc:
             st.session_state.streak += 1
-            progress["xp"] += 10
-            progress["total_exercises"] += 1
         else:
             st.session_state.streak = 0
-            if sim >= 0.75:
-                progress["xp"] += 5
-            st.session_state.difficult_words[resposta_en] = st.session_state.difficult_words.get(resposta_en, 0) + 1
+        registrar_evento(progress, "resposta", resposta_en=resposta_en, correta=bool(inc),
+                         xp=10 if inc else 5 if sim >= 0.75 else 0)
+        registrar_revisao(corpus, progress, nivel, frase, status, sim)
 
         # Update history
-        st.session_state.history.append({
+        linha = {
             "nivel": nivel,
             "pergunta": pergunta_en,
             "resposta_correta": resposta_en,
             "resposta_usuario": resposta_usuario,
             "resultado": "✅" if status == "success" else "⚠️" if status == "info" else "❌",
-            "similaridade": round(sim, 2)
-        })
+            "similaridade": round(sim, 2),
+            "variante": avaliacao.variante
+        }
+        registrar_historico(progress, linha)
 
         # Check achievements
-        new_achs = check_achievements(progress, st.session_state)
+        new_achs = conquistas_da_resposta(progress, st.session_state, bool(inc))
         if new_achs:
             st.session_state.new_achievements = new_achs
 
-        # Save progress
-        save_user_progress(progress)
-
         # Render feedback
-        render_feedback(status, msg, sim)
+        render_feedback(status, msg, sim, avaliacao.diferencas)
 
         # Rerun to show updated stats
         if new_achs:
             st.rerun()
 
     # Audio section
-    transcrito = render_audio_section(resposta_en)
+    transcrito, duracao_audio = render_audio_section(resposta_en)
     if transcrito:
-        status, msg, inc, sim = verificar_texto(transcrito, resposta_en)
+        avaliacao = avaliar_resposta(transcrito, referencias=corpus.referencias(frase),
+                                     semantico=corpus.semantico)
+        status, msg, inc, sim = avaliacao.como_tupla()
+        palavras_erradas = [esperada for _, esperada, _ in avaliacao.diferencas if esperada]
+        if palavras_erradas:
+            registrar_palavras_dificeis(progress, palavras_erradas)
 
         st.session_state.score += inc
         if inc:
             st.session_state.streak += 1
-            progress["xp"] += 10
-            progress["audio_used"] = progress.get("audio_used", 0) + 1
         else:
             st.session_state.streak = 0
-            if sim >= 0.75:
-                progress["xp"] += 5
+        registrar_evento(progress, "resposta", resposta_en=resposta_en, correta=bool(inc), audio=True,
+                         xp=10 if inc else 5 if sim >= 0.75 else 0)
+        registrar_revisao(corpus, progress, nivel, frase, status, sim)
 
-        st.session_state.history.append({
+        linha = {
             "nivel": nivel,
             "pergunta": pergunta_en,
             "resposta_correta": resposta_en,
             "resposta_usuario": transcrito,
             "resultado": "✅" if status == "success" else "⚠️" if status == "info" else "❌",
-            "similaridade": round(sim, 2)
-        })
+            "similaridade": round(sim, 2),
+            "variante": avaliacao.variante,
+            "duracao_audio": round(duracao_audio, 1)
+        }
+        registrar_historico(progress, linha)
 
-        new_achs = check_achievements(progress, st.session_state)
+        new_achs = conquistas_da_resposta(progress, st.session_state, bool(inc), audio=True)
         if new_achs:
             st.session_state.new_achievements = new_achs
 
-        save_user_progress(progress)
-        render_feedback(status, msg, sim)
+        render_feedback(status, msg, sim, avaliacao.diferencas)
 
         if new_achs:
             st.rerun()
@@ -1134,21 +3056,10 @@ def main():
     # Next phrase button
     st.markdown("<div style='margin-top:16px;'></div>", unsafe_allow_html=True)
     if st.button("➡ Próxima Frase", key="proxima_frase", use_container_width=True):
-        if st.session_state.difficult_words and random.random() < 0.3:
-            alvo = random.choice(list(st.session_state.difficult_words.keys()))
-            for f in SAMPLE_FRASES[nivel]:
-                if f.get("resposta_en") == alvo or f.get("en") == alvo:
-                    st.session_state.frase_atual = f
-                    break
-            else:
-                st.session_state.frase_atual = random.choice(SAMPLE_FRASES[nivel])
-        else:
-            st.session_state.frase_atual = random.choice(SAMPLE_FRASES[nivel])
-        st.session_state.resposta_usuario = ""
-        st.rerun()
+        avancar_frase(corpus, progress, nivel)
 
     # Vocabulary section
-    render_vocabulary_section(SAMPLE_VOCAB, progress)
+    render_vocabulary_section(corpus.vocab_por_topico, progress)
 
     # Achievements
     render_achievements(progress)
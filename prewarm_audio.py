@@ -0,0 +1,49 @@
+"""Pre-generate TTS audio for every phrase and vocabulary word.
+
+Usage:
+    python prewarm_audio.py [--workers 8] [--lang en]
+
+Only entries missing from the audio cache are synthesized, so the command
+can be re-run after editing frases.json / Vocabulario.json. Keep
+AUDIO_CACHE_MAX_MB above the size of the corpus or the eviction pass will
+drop prewarmed files.
+"""
+import argparse
+import sys
+
+from english_trainer_premium import (
+    AUDIO_CACHE_DIR, FRASES_FILE, VOCAB_FILE, carregar_corpus, coletar_textos_audio, preaquecer_audio
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate TTS audio for the whole corpus")
+    parser.add_argument("--workers", type=int, default=8, help="parallel gTTS requests")
+    parser.add_argument("--lang", default="en")
+    parser.add_argument("--frases", default=FRASES_FILE)
+    parser.add_argument("--vocabulario", default=VOCAB_FILE)
+    args = parser.parse_args(argv)
+
+    corpus = carregar_corpus(args.frases, args.vocabulario)
+    textos = coletar_textos_audio(corpus.frases_por_nivel, corpus.vocab_por_topico)
+
+    def progresso(i, total, texto):
+        print(f"\r[{i}/{total}] {texto[:60]:<60}", end="", flush=True)
+
+    relatorio = preaquecer_audio(textos, lang=args.lang, workers=args.workers, on_progress=progresso)
+    if relatorio["gerados"] or relatorio["falhas"]:
+        print()
+
+    segundos = relatorio["segundos"]
+    taxa = relatorio["gerados"] / segundos if segundos > 0 else 0.0
+    print(f"Cache: {AUDIO_CACHE_DIR}")
+    print(f"{relatorio['total']} textos | {relatorio['pulados']} já em cache | "
+          f"{relatorio['gerados']} gerados em {segundos:.1f}s ({taxa:.1f}/s) | "
+          f"{len(relatorio['falhas'])} falhas")
+    for texto, erro in relatorio["falhas"]:
+        print(f"  ✗ {texto}: {erro}")
+    return 1 if relatorio["falhas"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,14 @@
 import streamlit as st
 import random
-import base64
 import os
 import re
 import unicodedata
 import difflib
-from tempfile import NamedTemporaryFile
-from gtts import gTTS
-import speech_recognition as sr
 from audio_recorder_streamlit import audio_recorder
 import pandas as pd
 import json
+import wave
+from english_trainer_premium import carregar_corpus, tocar_audio, transcrever_wav_bytes
 
 # =============================
 # Arquivo para salvar progresso
@@ -30,27 +28,16 @@ def save_user_progress(data):
 # =============================
 # Carregar frases e vocabulário
 # =============================
-with open("frases.json", "r", encoding="utf-8") as f:
-    frases_por_nivel = json.load(f)
-
-with open("Vocabulario.json", "r", encoding="utf-8") as f:
-    Vocabulario = json.load(f)
+# Parsed once per process; reruns reuse the cached copy
+corpus = carregar_corpus(incluir_exemplos=False)
+Vocabulario = corpus.vocab_por_topico
 
 def escolher_banco(nivel):
-    return frases_por_nivel.get(nivel, [])
+    return corpus.frases(nivel)
 
 # =============================
 # Funções utilitárias
 # =============================
-def gerar_audio(texto, lang="en"):
-    tts = gTTS(text=texto, lang=lang)
-    filename = "voz.mp3"
-    tts.save(filename)
-    with open(filename, "rb") as f:
-        b64 = base64.b64encode(f.read()).decode()
-    os.remove(filename)
-    return f'<audio controls src="data:audio/mp3;base64,{b64}"></audio>'
-
 def normalizar(txt: str) -> str:
     txt = txt.strip().lower()
     txt = "".join(c for c in unicodedata.normalize("NFKD", txt) if not unicodedata.combining(c))
@@ -77,20 +64,6 @@ def verificar_texto(resposta_usuario: str, resposta_correta: str):
         return ("info", classificar_erro(resposta_usuario, resposta_correta), 0, sim)
     return ("error", classificar_erro(resposta_usuario, resposta_correta), 0, sim)
 
-def transcrever_wav_bytes(wav_bytes: bytes, language="en-US") -> str | None:
-    r = sr.Recognizer()
-    with NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-        tmp.write(wav_bytes)
-        tmp_path = tmp.name
-    try:
-        with sr.AudioFile(tmp_path) as source:
-            audio = r.record(source)
-        return r.recognize_google(audio, language=language)
-    except:
-        return None
-    finally:
-        os.remove(tmp_path)
-
 # =============================
 # Estado da Sessão
 # =============================
@@ -100,11 +73,19 @@ if "score" not in st.session_state: st.session_state.score = 0
 if "streak" not in st.session_state: st.session_state.streak = 0
 if "history" not in st.session_state: st.session_state.history = []
 if "difficult_words" not in st.session_state: st.session_state.difficult_words = {}
+if "revisoes" not in st.session_state: st.session_state.revisoes = {}  # nivel -> frases erradas
 if "voc_index" not in st.session_state: st.session_state.voc_index = 0
 if "resposta_usuario" not in st.session_state: st.session_state.resposta_usuario = ""
 
 progress = load_user_progress()
 
+def marcar_dificil(resposta_en):
+    contagem = st.session_state.difficult_words.get(resposta_en, 0)
+    st.session_state.difficult_words[resposta_en] = contagem + 1
+    if contagem == 0:  # primeira vez: entra na lista de revisão de cada nível que a usa
+        for nivel_frase, frase_revisao in corpus.ocorrencias(resposta_en):
+            st.session_state.revisoes.setdefault(nivel_frase, []).append(frase_revisao)
+
 # =============================
 # Configuração da página
 # =============================
@@ -143,14 +124,12 @@ else:
 
 with st.expander("💡 Resposta sugerida"):
     st.markdown(f"**EN:** {resposta_en}\n\n*PT:* {resposta_pt}")
-    if st.button("🔊 Ouvir resposta (EN)", key="audio_resposta"):
-        st.markdown(gerar_audio(resposta_en), unsafe_allow_html=True)
+    tocar_audio(resposta_en, clicado=st.button("🔊 Ouvir resposta (EN)", key="audio_resposta"))
 
 # =============================
 # Opção de áudio da pergunta
 # =============================
-if st.button("🔊 Ouvir pergunta (EN)", key="audio_pergunta"):
-    st.markdown(gerar_audio(pergunta_en), unsafe_allow_html=True)
+tocar_audio(pergunta_en, clicado=st.button("🔊 Ouvir pergunta (EN)", key="audio_pergunta"))
 
 # =============================
 # Responder por texto
@@ -169,7 +148,7 @@ if st.button("✅ Verificar resposta (texto)", key="verificar_texto"):
         "similaridade": round(sim, 2)
     })
     if status != "success":
-        st.session_state.difficult_words[resposta_en] = st.session_state.difficult_words.get(resposta_en, 0) + 1
+        marcar_dificil(resposta_en)
     save_user_progress(progress)
     if status == "success": st.success(msg)
     elif status == "info": st.info(msg)
@@ -183,7 +162,10 @@ st.divider()
 st.markdown("### 🎙️ Responder falando")
 audio_bytes = audio_recorder(sample_rate=44100, text="🎤 Gravar / Parar")
 if audio_bytes and st.button("🗣️ Transcrever e verificar", key="verificar_audio"):
-    transcrito = transcrever_wav_bytes(audio_bytes)
+    try:
+        transcrito = transcrever_wav_bytes(audio_bytes)
+    except (ValueError, EOFError, wave.Error):
+        transcrito = None  # gravação truncada ou em formato desconhecido
     if not transcrito:
         st.warning("Não entendi o áudio, tente novamente.")
     else:
@@ -200,7 +182,7 @@ if audio_bytes and st.button("🗣️ Transcrever e verificar", key="verificar_a
             "similaridade": round(sim, 2)
         })
         if status != "success":
-            st.session_state.difficult_words[resposta_en] = st.session_state.difficult_words.get(resposta_en, 0) + 1
+            marcar_dificil(resposta_en)
         save_user_progress(progress)
         if status == "success": st.success(msg)
         elif status == "info": st.info(msg)
@@ -210,12 +192,9 @@ if audio_bytes and st.button("🗣️ Transcrever e verificar", key="verificar_a
 # Próxima frase
 # =============================
 if st.button("➡ Próxima", key="proxima_frase"):
-    if st.session_state.difficult_words and random.random() < 0.3:
-        alvo = random.choice(list(st.session_state.difficult_words.keys()))
-        for f in escolher_banco(nivel):
-            if f["en"] == alvo:
-                st.session_state.frase_atual = f
-                break
+    revisoes = st.session_state.revisoes.get(nivel)
+    if revisoes and random.random() < 0.3:
+        st.session_state.frase_atual = random.choice(revisoes)
     else:
         st.session_state.frase_atual = random.choice(escolher_banco(nivel))
     st.session_state.resposta_usuario = ""  # limpa input
@@ -231,8 +210,7 @@ palavras = Vocabulario[topico]
 index = st.session_state.voc_index
 palavra_atual = palavras[index]
 st.markdown(f"PT: {palavra_atual['pt']}\nEN: {palavra_atual['en']}")
-if st.button("🔊 Ouvir palavra", key="audio_palavra"):
-    st.markdown(gerar_audio(palavra_atual['en']), unsafe_allow_html=True)
+tocar_audio(palavra_atual['en'], clicado=st.button("🔊 Ouvir palavra", key="audio_palavra"))
 
 col1, col2 = st.columns(2)
 with col1: